@@ -0,0 +1,58 @@
+"""Run the event scheduler benchmarks.
+
+Run with ``python -m benchmarks [--quick] [--json PATH] [name ...]``. The
+results are printed as text and, with --json, also written as JSON so they
+can be compared between versions.
+"""
+import argparse
+import json
+import platform
+import sys
+
+from benchmarks import cancel, dispatch, enter, entries, jitter, periodic, \
+    recurring, simulation
+
+BENCHMARKS = {
+    'enter': (enter.run, {'events_per_thread': 2000}),
+    'cancel': (cancel.run, {'sizes': (10 ** 3, 10 ** 4)}),
+    'dispatch': (dispatch.run, {'events': 5000}),
+    'recurring': (recurring.run, {'recurring': (10,), 'duration': 0.2}),
+    'jitter': (jitter.run, {'events': 50}),
+    'entries': (entries.run, {'events': 5000}),
+    'simulation': (simulation.run, {'recurring': (10,), 'duration': 3600}),
+    'periodic': (periodic.run, {'jobs': (1000,), 'duration': 600}),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help='benchmarks to run among {}, all of them by '
+                             'default'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--quick', action='store_true',
+                        help='run with small sizes, as a smoke test')
+    parser.add_argument('--json', metavar='PATH',
+                        help='write the results as JSON to PATH')
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: ' + ', '.join(sorted(unknown)))
+    results = {'python': sys.version,
+               'implementation': platform.python_implementation(),
+               'platform': platform.platform(),
+               'benchmarks': {}}
+    for name in args.names or BENCHMARKS:
+        run, quick_kwargs = BENCHMARKS[name]
+        rows = run(**quick_kwargs) if args.quick else run()
+        results['benchmarks'][name] = rows
+        for row in rows:
+            print(name, ' '.join('{}={:.6g}'.format(key, value)
+                                 for key, value in row.items()))
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Measure the cost of cancelling events at various queue sizes.
+
+Run with ``python -m benchmarks.cancel [size ...]``.
+"""
+import sys
+from time import perf_counter
+
+from event_scheduler import EventScheduler
+
+DEFAULT_SIZES = (10 ** 4, 10 ** 5, 10 ** 6)
+
+
+def _noop():
+    pass
+
+
+def bench_cancel(size: int) -> dict:
+    """Fill a scheduler with `size` far-future events then cancel all but
+    one of them.
+
+    Returns:
+        dict: The queue size, the total time spent cancelling and the mean
+        cost of a single cancel, in seconds.
+    """
+    event_scheduler = EventScheduler('bench_cancel')
+    event_scheduler.start()
+    # Far in the future so none of the events execute during the benchmark
+    base = event_scheduler.timefunc() + 3600
+    events = [event_scheduler.enterabs(base + i, 0, _noop)
+              for i in range(size)]
+    start = perf_counter()
+    for event in events[1:]:
+        event_scheduler.cancel(event)
+    elapsed = perf_counter() - start
+    event_scheduler.stop(hard_stop=True)
+    return {'size': size,
+            'total': elapsed,
+            'per_cancel': elapsed / max(size - 1, 1)}
+
+
+def run(sizes=DEFAULT_SIZES) -> list:
+    return [bench_cancel(size) for size in sizes]
+
+
+def main(argv=None):
+    sizes = [int(arg) for arg in (argv or [])] or DEFAULT_SIZES
+    for result in run(sizes):
+        print('size={size:>9} total={total:.3f}s '
+              'per_cancel={per_cancel:.2e}s'.format(**result))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,41 @@
+"""Measure the end-to-end dispatch rate of events which are already due."""
+import threading
+from time import perf_counter
+
+from event_scheduler import EventScheduler
+
+
+def bench_dispatch(events: int, batch_dispatch: bool = False) -> dict:
+    """Enter `events` zero-delay events and wait until they all executed.
+
+    Returns:
+        dict: The number of events, whether they were dispatched in batches,
+        the elapsed time in seconds and the number of events dispatched per
+        second.
+    """
+    event_scheduler = EventScheduler('bench_dispatch',
+                                     batch_dispatch=batch_dispatch)
+    event_scheduler.start()
+    done = threading.Event()
+    remaining = [events]
+
+    def countdown():
+        remaining[0] -= 1
+        if not remaining[0]:
+            done.set()
+
+    start = perf_counter()
+    for _ in range(events):
+        event_scheduler.enter(0, 0, countdown)
+    done.wait()
+    elapsed = perf_counter() - start
+    event_scheduler.stop()
+    return {'events': events,
+            'batch_dispatch': batch_dispatch,
+            'elapsed': elapsed,
+            'events_per_second': events / elapsed}
+
+
+def run(events=100000) -> list:
+    return [bench_dispatch(events, batch_dispatch)
+            for batch_dispatch in (False, True)]
@@ -0,0 +1,51 @@
+"""Measure the throughput of enterabs() from concurrent producer threads."""
+import threading
+from time import perf_counter
+
+from event_scheduler import EventScheduler
+
+DEFAULT_THREADS = (1, 2, 4, 8)
+
+
+def _noop():
+    pass
+
+
+def bench_enter(threads: int, events_per_thread: int) -> dict:
+    """Enter `events_per_thread` far-future events from each of `threads`
+    producer threads at the same time.
+
+    Returns:
+        dict: The number of threads and events, the elapsed time in seconds
+        and the number of events entered per second.
+    """
+    event_scheduler = EventScheduler('bench_enter')
+    event_scheduler.start()
+    base = event_scheduler.timefunc() + 3600
+    barrier = threading.Barrier(threads + 1)
+
+    def produce(offset):
+        enterabs = event_scheduler.enterabs
+        barrier.wait()
+        for i in range(events_per_thread):
+            enterabs(base + offset + i, 0, _noop)
+
+    producers = [threading.Thread(target=produce, args=(n,))
+                 for n in range(threads)]
+    for producer in producers:
+        producer.start()
+    barrier.wait()
+    start = perf_counter()
+    for producer in producers:
+        producer.join()
+    elapsed = perf_counter() - start
+    event_scheduler.stop(hard_stop=True)
+    events = threads * events_per_thread
+    return {'threads': threads,
+            'events': events,
+            'elapsed': elapsed,
+            'events_per_second': events / elapsed}
+
+
+def run(threads=DEFAULT_THREADS, events_per_thread=50000) -> list:
+    return [bench_enter(count, events_per_thread) for count in threads]
@@ -0,0 +1,44 @@
+"""Measure how late events fire relative to their scheduled time."""
+from time import sleep
+
+from event_scheduler import EventScheduler
+
+
+def _percentile(ordered, percent):
+    index = min(len(ordered) - 1, int(percent / 100 * len(ordered)))
+    return ordered[index]
+
+
+def bench_jitter(events: int, spacing: float) -> dict:
+    """Schedule `events` events `spacing` seconds apart and record the
+    difference between the time they fired and their scheduled time.
+
+    Returns:
+        dict: The number of events, the spacing, and the median, 90th, 99th
+        percentiles and maximum lateness in seconds.
+    """
+    event_scheduler = EventScheduler('bench_jitter')
+    event_scheduler.start()
+    timefunc = event_scheduler.timefunc
+    lateness = []
+
+    def record(scheduled):
+        lateness.append(timefunc() - scheduled)
+
+    base = timefunc() + 0.05
+    for i in range(events):
+        time = base + i * spacing
+        event_scheduler.enterabs(time, 0, record, (time,))
+    sleep(0.05 + events * spacing)
+    event_scheduler.stop()
+    lateness.sort()
+    return {'events': events,
+            'spacing': spacing,
+            'p50': _percentile(lateness, 50),
+            'p90': _percentile(lateness, 90),
+            'p99': _percentile(lateness, 99),
+            'max': lateness[-1]}
+
+
+def run(events=500, spacing=0.002) -> list:
+    return [bench_jitter(events, spacing)]
@@ -0,0 +1,47 @@
+"""Compare the memory and the firing rate of periodic jobs with the ones of
+recurring events, in the simulated event scheduler.
+"""
+from time import perf_counter
+import tracemalloc
+
+from event_scheduler import SimulatedEventScheduler
+
+
+def bench_periodic(jobs: int, periodic: bool, interval: float,
+                   duration: float) -> dict:
+    """Enter `jobs` periodic jobs, or recurring events, with the given
+    `interval` and simulate them for `duration` seconds of virtual time.
+
+    Returns:
+        dict: The number of jobs, whether they're periodic jobs, the bytes
+        allocated per job when they're entered, the number of firings and the
+        firings per second.
+    """
+    event_scheduler = SimulatedEventScheduler()
+    event_scheduler.start()
+    enter = event_scheduler.enter_periodic if periodic else \
+        event_scheduler.enter_recurring
+    tracemalloc.start()
+    for device in range(jobs):
+        enter(interval, 0, _heartbeat, (device,))
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    _heartbeat.fired = 0
+    start = perf_counter()
+    event_scheduler.run_until(duration)
+    elapsed = perf_counter() - start
+    event_scheduler.stop(hard_stop=True)
+    return {'jobs': jobs,
+            'periodic': int(periodic),
+            'bytes_per_job': allocated / jobs,
+            'fired': _heartbeat.fired,
+            'firings_per_second': _heartbeat.fired / elapsed}
+
+
+def _heartbeat(device):
+    _heartbeat.fired += 1
+
+
+def run(jobs=(100000,), interval=60, duration=600) -> list:
+    return [bench_periodic(count, periodic, interval, duration)
+            for count in jobs for periodic in (False, True)]
@@ -0,0 +1,37 @@
+"""Measure the overhead of rescheduling recurring events."""
+from time import perf_counter
+from time import sleep
+
+from event_scheduler import EventScheduler
+
+
+def bench_recurring(recurring: int, interval: float, duration: float) -> dict:
+    """Run `recurring` recurring events with the given `interval` for
+    `duration` seconds.
+
+    Returns:
+        dict: The number of recurring events, the number of times they fired,
+        the expected number of firings and the firings per second.
+    """
+    event_scheduler = EventScheduler('bench_recurring')
+    event_scheduler.start()
+    fired = [0]
+
+    def tick():
+        fired[0] += 1
+
+    start = perf_counter()
+    for _ in range(recurring):
+        event_scheduler.enter_recurring(interval, 0, tick)
+    sleep(duration)
+    event_scheduler.stop(hard_stop=True)
+    elapsed = perf_counter() - start
+    return {'recurring': recurring,
+            'interval': interval,
+            'fired': fired[0],
+            'expected': int(recurring * duration / interval),
+            'firings_per_second': fired[0] / elapsed}
+
+
+def run(recurring=(10, 1000), interval=0.01, duration=1.0) -> list:
+    return [bench_recurring(count, interval, duration) for count in recurring]
@@ -0,0 +1,36 @@
+"""Measure how fast the simulated event scheduler runs schedules in virtual
+time.
+"""
+from time import perf_counter
+
+from event_scheduler import SimulatedEventScheduler
+
+
+def bench_simulation(recurring: int, interval: float, duration: float) -> dict:
+    """Simulate `recurring` recurring events with the given `interval` for
+    `duration` seconds of virtual time.
+
+    Returns:
+        dict: The number of recurring events, the number of events executed,
+        the elapsed time and the events executed per second.
+    """
+    event_scheduler = SimulatedEventScheduler()
+    event_scheduler.start()
+    for _ in range(recurring):
+        event_scheduler.enter_recurring(interval, 0, _noop)
+    start = perf_counter()
+    executed = event_scheduler.run_until(duration)
+    elapsed = perf_counter() - start
+    event_scheduler.stop(hard_stop=True)
+    return {'recurring': recurring,
+            'executed': executed,
+            'elapsed': elapsed,
+            'events_per_second': executed / elapsed}
+
+
+def _noop():
+    pass
+
+
+def run(recurring=(1000,), interval=60, duration=86400) -> list:
+    return [bench_simulation(count, interval, duration) for count in recurring]
@@ -1 +1,7 @@
-from event_scheduler.event_scheduler import EventScheduler
+from event_scheduler.event_scheduler import CatchUpPolicy, EventScheduler, \
+    KeyedMode
+from event_scheduler.async_event_scheduler import AsyncEventScheduler
+from event_scheduler.coordinated_event_scheduler import \
+    CoordinatedEventScheduler
+from event_scheduler.sharded_event_scheduler import ShardedEventScheduler
+from event_scheduler.simulation import SimulatedEventScheduler
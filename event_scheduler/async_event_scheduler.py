@@ -0,0 +1,425 @@
+import asyncio
+from functools import partial
+import inspect
+import itertools
+import sys
+
+from event_scheduler.event_scheduler import CatchUpPolicy, Event, \
+    SchedulerStatus, _sentinel
+from event_scheduler.queues import HeapQueue
+
+
+class AsyncEventScheduler:
+    """
+    The Async Event Scheduler runs events on an asyncio event loop instead of
+    an internal thread. It has the same API as the EventScheduler, but events
+    are scheduled against the loop's clock (loop.time()) and a single loop
+    timer is armed for the soonest event. Actions can be regular functions
+    or coroutine functions, coroutines are run as tasks on the loop.
+
+    The Async Event Scheduler isn't thread-safe, its methods must be called
+    from the thread running the event loop.
+    """
+    def __init__(self, loop=None, queue_class=HeapQueue):
+        """
+        Args:
+            loop (:obj:`asyncio.AbstractEventLoop`, optional): provide the
+            event loop the scheduler runs on. Defaults to the current event
+            loop when the scheduler is started.
+            queue_class (optional): provide the class of the queue holding
+            the scheduled events, either :obj:`queues.HeapQueue` or
+            :obj:`queues.TimingWheelQueue`.
+        """
+        self._loop = loop
+        self._queue = queue_class()
+        # Sequence numbers of the queue entries, to break ties between events
+        # with the same time and priority
+        self._sequence = itertools.count()
+        # Events which are still pending in the queue, keyed by their
+        # identity. Cancelled events are left in the queue as tombstones.
+        self._pending = {}
+        self._scheduler_status = SchedulerStatus.STOPPED
+        # Handle of the loop timer armed for the soonest event and its
+        # deadline.
+        self._handle = None
+        self._deadline = None
+        # Tasks of the coroutine actions which haven't completed yet
+        self._tasks = set()
+        # Resolved once the queue is drained when stopping
+        self._drained = None
+        # dictionary to store all currently active recurring events (key: id,
+        # value: (Event, interval, CatchUpPolicy))
+        self._recurring_events = {}
+        # Number of occurrences skipped by the recurring events with the
+        # COALESCE policy (key: id, value: count)
+        self._skipped_ticks = {}
+        # monotonically increasing counter to provide unique event_ids for
+        # recurring events
+        self._id_counter = 0
+
+    def timefunc(self) -> float:
+        """Return the current time of the scheduler's event loop."""
+        return self._loop.time() if self._loop else \
+            asyncio.get_event_loop().time()
+
+    def _push(self, event):
+        entry = (event.time, event.priority, next(self._sequence), event)
+        self._queue.push(entry)
+        self._pending[id(event)] = event
+        if self._queue.peek() is entry:
+            self._arm()
+
+    def _arm(self):
+        """Arm the loop timer for the soonest pending event."""
+        queue = self._queue
+        pending = self._pending
+        # Discard the tombstones of cancelled events
+        while queue and id(queue.peek()[3]) not in pending:
+            queue.pop()
+        deadline = queue.peek()[0] if queue else None
+        if self._handle is not None and deadline == self._deadline:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._deadline = deadline
+        if deadline is not None:
+            self._handle = self._loop.call_at(deadline, self._run)
+        elif self._scheduler_status == SchedulerStatus.STOPPING and \
+                not self._drained.done():
+            self._drained.set_result(None)
+
+    def _run(self):
+        """Execute all the events which are due, then arm the loop timer for
+        the next event.
+        """
+        self._handle = None
+        queue = self._queue
+        pending = self._pending
+        now = self._loop.time()
+        while queue:
+            time, _, _, event = queue.peek()
+            if id(event) not in pending:
+                queue.pop()
+                continue
+            if time > now:
+                break
+            queue.pop()
+            del pending[id(event)]
+            if event.id:
+                self._reschedule_recurring(event, now)
+            self._execute(event)
+        self._arm()
+
+    def _execute(self, event):
+        try:
+            result = event.action(*event.argument, **event.kwargs)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result, loop=self._loop)
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+                if event.id:
+                    task.add_done_callback(
+                        partial(self._reschedule_completed, event))
+                return
+        except Exception as exc:
+            self._loop.call_exception_handler({
+                'message': 'Exception in event scheduler action',
+                'exception': exc,
+                'event': event,
+            })
+        if event.id:
+            self._reschedule_completed(event)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._loop.call_exception_handler({
+                'message': 'Exception in event scheduler coroutine action',
+                'exception': task.exception(),
+                'task': task,
+            })
+
+    def _reschedule_recurring(self, event, now):
+        recurring = self._recurring_events.get(event.id)
+        if recurring is None or \
+                self._scheduler_status != SchedulerStatus.RUNNING:
+            return
+        _, interval, catch_up = recurring
+        if catch_up == CatchUpPolicy.FIXED_DELAY:
+            # Rescheduled once its action completes
+            return
+        # We do the scheduling based on the previous execution time
+        time = event.time + interval
+        if catch_up == CatchUpPolicy.COALESCE and time <= now:
+            # This execution stands for the occurrences which are already
+            # due, skip ahead to the next one in the future.
+            skipped = int((now - event.time) // interval)
+            time = event.time + (skipped + 1) * interval
+            self._skipped_ticks[event.id] = \
+                self._skipped_ticks.get(event.id, 0) + skipped
+        event = event._replace(time=time)
+        self._recurring_events[event.id] = (event, interval, catch_up)
+        self._push(event)
+
+    def _reschedule_completed(self, event, task=None):
+        """Reschedule a recurring event with the FIXED_DELAY policy once its
+        action or coroutine completed.
+        """
+        recurring = self._recurring_events.get(event.id)
+        # The event may have been cancelled while its action executed
+        if recurring is None or recurring[0] is not event or \
+                recurring[2] != CatchUpPolicy.FIXED_DELAY or \
+                self._scheduler_status != SchedulerStatus.RUNNING:
+            return
+        _, interval, catch_up = recurring
+        event = event._replace(time=self._loop.time() + interval)
+        self._recurring_events[event.id] = (event, interval, catch_up)
+        self._push(event)
+
+    def enterabs(self,
+                 time,
+                 priority,
+                 action,
+                 arguments=(),
+                 kwargs=_sentinel) -> Event:
+        """Enter a new event in the queue to occur at an absolute time of the
+        event loop's clock.
+
+        Args:
+            time: The absolute time the event will be scheduled to execute.
+            priority (int): The priority the event will execute with. If two
+                events are scheduled for the same time, the event with the
+                lower priority will execute first.
+            action (callable): The function or coroutine function which will
+                invoked when the event executes.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+
+        Returns:
+            Event: The scheduled event if the scheduler is running, None
+            otherwise. This can be used to cancel the event later, if
+            necessary.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize
+        """
+        if priority >= sys.maxsize or priority < 0:
+            raise ValueError('Priority must be equal to or greater than 0 and '
+                             'less than sys.maxsize')
+        if kwargs is _sentinel:
+            kwargs = {}
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return None
+        # Non-recurring events have an id of 0
+        event = Event(time, priority, action, arguments, kwargs, 0)
+        self._push(event)
+        return event
+
+    def enter(self,
+              delay,
+              priority,
+              action,
+              arguments=(),
+              kwargs=_sentinel) -> Event:
+        """Enter a new event in the queue to occur at a time relative to the
+        current time.
+
+        Args:
+            delay: The relative time the event will be scheduled to execute.
+            priority (int): The priority the event will execute with. If two
+                events are scheduled for the same time, the event with the
+                lower priority will execute first.
+            action (callable): The function or coroutine function which will
+                invoked when the event executes.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+
+        Returns:
+            Event: The scheduled event if the scheduler is running, None
+            otherwise. This can be used to cancel the event later, if
+            necessary.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize
+        """
+        return self.enterabs(self.timefunc() + delay,
+                             priority,
+                             action,
+                             arguments,
+                             kwargs)
+
+    def enter_recurring(self,
+                        interval,
+                        priority,
+                        action,
+                        arguments=(),
+                        kwargs=_sentinel,
+                        catch_up=CatchUpPolicy.FIRE_ALL) -> int:
+        """Enter a new recurring event in the queue to occur at a specified
+        interval.
+
+        Args:
+            interval: The interval time the event will be scheduled to execute.
+            priority (int): The priority the event will execute with. If two
+                events are scheduled for the same time, the event with the
+                lower priority will execute first.
+            action (callable): The function or coroutine function which will
+                invoked when the event executes.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            catch_up (:obj:`CatchUpPolicy`, optional): How the event is
+                rescheduled when the event loop falls behind. With
+                FIXED_DELAY, the next occurrence is scheduled once the
+                coroutine of the action completes.
+
+        Returns:
+            int: An event id of the recurring event if the scheduler is
+            running, None otherwise. This id can be used to cancel the event
+            later, if necessary.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize
+        """
+        if priority >= sys.maxsize or priority < 0:
+            raise ValueError('Priority must be equal to or greater than 0 and '
+                             'less than sys.maxsize')
+        if kwargs is _sentinel:
+            kwargs = {}
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return None
+        self._id_counter += 1
+        event = Event(self.timefunc() + interval,
+                      priority,
+                      action,
+                      arguments,
+                      kwargs,
+                      self._id_counter)
+        self._recurring_events[self._id_counter] = (event, interval, catch_up)
+        self._push(event)
+        return self._id_counter
+
+    def cancel(self, event: Event) -> int:
+        """Remove an event from the queue using the event returned by
+        enter()/enterabs(). If the event is not in the queue, this is a no-op.
+
+        Args:
+            event: The event to be cancelled.
+
+        Returns:
+            int: 0 if the event was successfully removed/not in the queue, -1
+            otherwise.
+        """
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return -1
+        self._discard(event)
+        return 0
+
+    def _discard(self, event):
+        if self._pending.get(id(event)) is not event:
+            return
+        del self._pending[id(event)]
+        if self._queue.peek()[3] is event:
+            self._arm()
+
+    def cancel_recurring(self, event_id) -> int:
+        """Remove recurring event from the queue using the id returned by
+        enter_recurring(). If the recurring event is not in the queue, this is
+        a no-op.
+
+        Args:
+            event_id (int): The id of the recurring event to be cancelled.
+
+        Returns:
+            int: 0 if the event was successfully removed/not in the queue, -1
+            otherwise.
+        """
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return -1
+        if event_id in self._recurring_events:
+            self._discard(self._recurring_events.pop(event_id)[0])
+            self._skipped_ticks.pop(event_id, None)
+        return 0
+
+    def skipped_ticks(self, event_id) -> int:
+        """Return the number of occurrences of a recurring event which were
+        skipped because of its COALESCE catch-up policy.
+
+        Args:
+            event_id (int): The id of the recurring event.
+
+        Returns:
+            int: The number of skipped occurrences, 0 if the recurring event
+            isn't scheduled.
+        """
+        return self._skipped_ticks.get(event_id, 0)
+
+    def cancel_all(self) -> int:
+        """Clear all events from the queue. Coroutine actions which already
+        started aren't cancelled.
+
+        Returns:
+            int: 0 if all the events were successfully cleared, -1 otherwise.
+        """
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return -1
+        self._queue.clear()
+        self._pending.clear()
+        self._recurring_events.clear()
+        self._skipped_ticks.clear()
+        self._arm()
+        return 0
+
+    @property
+    def queue(self) -> list:
+        """Return an ordered list of upcoming events.
+
+        Returns:
+            list: All the events currently in the queue ordered from the
+            soonest to occur and by priority,
+        """
+        pending = self._pending
+        return [entry[3] for entry in sorted(entry for entry in self._queue
+                                             if id(entry[3]) in pending)]
+
+    def start(self) -> int:
+        """Start the scheduler on its event loop and enable it to start taking
+        events.
+
+        Returns:
+            int: 0 if the event scheduler was successfully started, -1 if the
+            scheduler has already been started or is in the process of
+            stopping.
+        """
+        if self._scheduler_status != SchedulerStatus.STOPPED:
+            return -1
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        self._drained = self._loop.create_future()
+        self._scheduler_status = SchedulerStatus.RUNNING
+        return 0
+
+    async def stop(self, hard_stop: bool = False) -> int:
+        """Stop the scheduler. Will not be able to take in new events when
+        invoked. Recurring events aren't rescheduled anymore.
+
+        Args:
+            hard_stop (bool, optional): If set to `False`, wait until all
+                events execute at their scheduled time and all coroutine
+                actions complete before stopping. If set to `True`, discard
+                all pending events right away.
+        Returns:
+            int: 0 if the event scheduler was successfully stopped, -1 if the
+            scheduler is already in the process of stopping/already stopped.
+        """
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return -1
+        if hard_stop:
+            self.cancel_all()
+        self._scheduler_status = SchedulerStatus.STOPPING
+        self._arm()
+        await self._drained
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+        self._scheduler_status = SchedulerStatus.STOPPED
+        return 0
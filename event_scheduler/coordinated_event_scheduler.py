@@ -0,0 +1,397 @@
+import json
+import math
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from time import time as wall_time
+import uuid
+
+from event_scheduler.event_scheduler import EventScheduler, _sentinel
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE,
+    due REAL NOT NULL,
+    priority INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    arguments TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    interval REAL,
+    owner TEXT,
+    lease_expiry REAL
+);
+CREATE INDEX IF NOT EXISTS events_due ON events (due, priority);
+"""
+
+
+class CoordinatedEventScheduler:
+    """
+    The Coordinated Event Scheduler shares its events with the other
+    coordinated event schedulers using the same store, a SQLite database
+    file, in this process or in other processes on the same host. Every event
+    executes in only one of them: due events are claimed with a lease, and
+    the events leased by a process which crashed are claimed again once their
+    lease expires.
+
+    Each scheduler polls the store from an internal event scheduler, claims
+    the due events and executes their actions on it. Like the
+    :obj:`journal.Journal`, events are stored with the name of their action
+    in a registry, their arguments must be serializable to JSON and their
+    times are wall-clock times.
+
+    A lease must outlive the action of its event, otherwise the event can be
+    claimed again while it's still executing.
+    """
+    def __init__(self,
+                 path,
+                 actions,
+                 lease_duration=30.0,
+                 poll_interval=0.5,
+                 batch_size=100,
+                 thread_name=None,
+                 **kwargs):
+        """
+        Args:
+            path (str): The path of the SQLite database file of the store.
+            actions (dict): The registry of actions, mapping names to
+                callables. A scheduler only claims the events with an action
+                in its registry, the others are left to the schedulers
+                sharing the store which have it.
+            lease_duration (float, optional): The number of seconds a claimed
+                event is reserved for this scheduler.
+            poll_interval (float, optional): The maximum number of seconds
+                between two polls of the store.
+            batch_size (int, optional): The maximum number of events claimed
+                per poll.
+            thread_name (str, optional): provide a string name for the
+            internal thread.
+            **kwargs: Arguments used to create the internal event scheduler,
+            see :obj:`EventScheduler`. Use max_workers to execute the claimed
+            events on a thread pool.
+        """
+        self._path = path
+        self._actions = dict(actions)
+        self._names = {action: name for name, action in actions.items()}
+        self._lease_duration = lease_duration
+        self._poll_interval = poll_interval
+        self._batch_size = batch_size
+        self._scheduler = EventScheduler(thread_name, **kwargs)
+        # Identifies the leases of this scheduler in the store
+        self._owner = '{}:{}:{}'.format(socket.gethostname(),
+                                        os.getpid(),
+                                        uuid.uuid4().hex)
+        self._connection = None
+        # The connection is shared by the internal thread, the executor and
+        # the producers.
+        self._connection_lock = threading.Lock()
+        # Event of the next poll in the internal event scheduler
+        self._poll_event = None
+
+    def _execute_sql(self, sql, parameters=()):
+        with self._connection_lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _encode(self, action, arguments, kwargs):
+        name = self._names.get(action)
+        if name is None:
+            raise ValueError('The action of a coordinated event must be in '
+                             'the registry')
+        try:
+            return name, json.dumps(list(arguments)), json.dumps(kwargs)
+        except TypeError as exc:
+            raise ValueError('The arguments of a coordinated event must be '
+                             'serializable to JSON') from exc
+
+    def enterabs(self,
+                 time,
+                 priority,
+                 action,
+                 arguments=(),
+                 kwargs=_sentinel) -> int:
+        """Enter a new event in the store to occur at an absolute wall-clock
+        time.
+
+        Args:
+            time (float): The wall-clock time, as returned by time.time(), the
+                event will be scheduled to execute.
+            priority (int): The priority the event will execute with. If two
+                events are scheduled for the same time, the event with the
+                lower priority will execute first.
+            action (callable): The function which will invoked when the event
+                executes. It must be in the registry.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+
+        Returns:
+            int: The id of the event in the store if the scheduler is
+            running, None otherwise. This can be used to cancel the event
+            later, if necessary.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize, if the action
+                isn't in the registry or if the arguments can't be serialized.
+        """
+        return self._insert(None, time, priority, action, arguments, kwargs,
+                            None)
+
+    def enter(self,
+              delay,
+              priority,
+              action,
+              arguments=(),
+              kwargs=_sentinel) -> int:
+        """Enter a new event in the store to occur at a time relative to the
+        current time. See enterabs().
+        """
+        return self._insert(None, wall_time() + delay, priority, action,
+                            arguments, kwargs, None)
+
+    def enter_recurring(self,
+                        interval,
+                        priority,
+                        action,
+                        arguments=(),
+                        kwargs=_sentinel,
+                        name=None) -> int:
+        """Enter a new recurring event in the store to occur at a specified
+        interval. Occurrences missed while no scheduler was running are
+        skipped.
+
+        Args:
+            interval: The interval time the event will be scheduled to execute.
+            priority (int): The priority the event will execute with.
+            action (callable): The function which will invoked when the event
+                executes. It must be in the registry.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            name (str, optional): A unique name for the recurring event. If
+                an event with the same name is already in the store, it's
+                kept and its id is returned, so every process can enter the
+                same recurring event at startup and it executes only once per
+                interval.
+
+        Returns:
+            int: The id of the event in the store if the scheduler is
+            running, None otherwise.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize, if the action
+                isn't in the registry or if the arguments can't be serialized.
+        """
+        return self._insert(name, wall_time() + interval, priority, action,
+                            arguments, kwargs, interval)
+
+    def _insert(self, name, time, priority, action, arguments, kwargs,
+                interval):
+        if priority >= sys.maxsize or priority < 0:
+            raise ValueError('Priority must be equal to or greater than 0 and '
+                             'less than sys.maxsize')
+        if kwargs is _sentinel:
+            kwargs = {}
+        action_name, arguments, kwargs = self._encode(action,
+                                                      arguments,
+                                                      kwargs)
+        with self._connection_lock:
+            if self._connection is None:
+                return None
+            cursor = self._connection.execute(
+                'INSERT OR IGNORE INTO events (name, due, priority, action, '
+                'arguments, kwargs, interval) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (name, time, priority, action_name, arguments, kwargs,
+                 interval))
+            record_id = cursor.lastrowid
+            if not cursor.rowcount:
+                record_id = self._connection.execute(
+                    'SELECT id FROM events WHERE name = ?',
+                    (name,)).fetchone()[0]
+        self._wake_up(time)
+        return record_id
+
+    def _wake_up(self, time):
+        """Poll earlier if an event was entered before the next poll."""
+        poll_event = self._poll_event
+        if poll_event is None:
+            return
+        delay = max(0, time - wall_time())
+        local_time = self._scheduler.timefunc() + delay
+        if local_time < poll_event.time:
+            moved = self._scheduler.reschedule(poll_event, local_time)
+            if moved is not None:
+                self._poll_event = moved
+
+    def cancel(self, record_id) -> int:
+        """Remove an event from the store using the id returned by
+        enter()/enterabs()/enter_recurring(). If the event is not in the
+        store, this is a no-op. An event already claimed by a scheduler still
+        executes, but a recurring event isn't rescheduled.
+
+        Returns:
+            int: 0 if the event was successfully removed/not in the store, -1
+            otherwise.
+        """
+        if self._connection is None:
+            return -1
+        self._execute_sql('DELETE FROM events WHERE id = ?', (record_id,))
+        return 0
+
+    def cancel_recurring(self, record_id) -> int:
+        """Remove a recurring event from the store. See cancel()."""
+        return self.cancel(record_id)
+
+    def _poll(self):
+        """Claim the due events of the store and enter them in the internal
+        event scheduler, then schedule the next poll. Executed on the internal
+        thread.
+        """
+        if self._poll_event is None:
+            # The scheduler is stopping
+            return
+        now = wall_time()
+        next_due = None
+        try:
+            next_due = self._claim(now)
+        finally:
+            # Polling goes on even if the store couldn't be read
+            delay = self._poll_interval
+            if next_due is not None:
+                delay = min(delay, max(0, next_due - now))
+            if self._poll_event is not None:
+                self._poll_event = self._scheduler.enter(delay, 0, self._poll)
+
+    def _claim(self, now):
+        """Claim the due events with an action in the registry and enter them
+        in the internal event scheduler. The events with an action of a
+        scheduler with a different registry are left to it.
+
+        Returns:
+            float: The time of the next event to claim, None if there is
+            none.
+        """
+        names = sorted(self._actions)
+        in_registry = 'action IN ({})'.format(', '.join('?' * len(names)))
+        with self._connection_lock:
+            connection = self._connection
+            if connection is None:
+                return None
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                claimed = connection.execute(
+                    'SELECT id, due, priority, action, arguments, kwargs, '
+                    'interval FROM events WHERE due <= ? AND (owner IS NULL '
+                    'OR lease_expiry < ?) AND ' + in_registry +
+                    ' ORDER BY due, priority LIMIT ?',
+                    (now, now, *names, self._batch_size)).fetchall()
+                connection.executemany(
+                    'UPDATE events SET owner = ?, lease_expiry = ? '
+                    'WHERE id = ?',
+                    [(self._owner, now + self._lease_duration, row[0])
+                     for row in claimed])
+                next_due = connection.execute(
+                    'SELECT MIN(CASE WHEN owner IS NULL THEN due ELSE '
+                    'MAX(due, lease_expiry) END) FROM events WHERE ' +
+                    in_registry, names).fetchone()[0]
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        for record_id, due, priority, action, arguments, kwargs, interval \
+                in claimed:
+            self._scheduler.enter(0,
+                                  priority,
+                                  self._execute,
+                                  (record_id,
+                                   due,
+                                   interval,
+                                   self._actions[action],
+                                   json.loads(arguments),
+                                   json.loads(kwargs)))
+        return next_due
+
+    def _execute(self, record_id, due, interval, action, arguments, kwargs):
+        try:
+            action(*arguments, **kwargs)
+        finally:
+            self._complete(record_id, due, interval)
+
+    def _complete(self, record_id, due, interval):
+        """Remove an executed event from the store, or reschedule it if it's
+        recurring, unless its lease was lost meanwhile.
+        """
+        if interval is None:
+            self._execute_sql('DELETE FROM events WHERE id = ? AND owner = ?',
+                              (record_id, self._owner))
+            return
+        now = wall_time()
+        # Skip the occurrences missed while the event was late
+        due += max(1, math.ceil((now - due) / interval)) * interval
+        self._execute_sql('UPDATE events SET due = ?, owner = NULL, '
+                          'lease_expiry = NULL WHERE id = ? AND owner = ?',
+                          (due, record_id, self._owner))
+        self._wake_up(due)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the store.
+
+        Returns:
+            dict: The number of events in the store ('queue_depth') and the
+            number of them currently leased by a scheduler ('leased').
+        """
+        if self._connection is None:
+            return {'queue_depth': 0, 'leased': 0}
+        now = wall_time()
+        depth, leased = self._execute_sql(
+            'SELECT COUNT(*), COUNT(CASE WHEN owner IS NOT NULL AND '
+            'lease_expiry >= ? THEN 1 END) FROM events', (now,))[0]
+        return {'queue_depth': depth, 'leased': leased}
+
+    def start(self) -> int:
+        """Open the store and start polling it.
+
+        Returns:
+            int: 0 if the event scheduler was successfully started, -1 if the
+            scheduler has already been started or is in the process of
+            stopping.
+        """
+        if self._scheduler.start() != 0:
+            return -1
+        connection = sqlite3.connect(self._path,
+                                     timeout=max(5.0, self._lease_duration),
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+        with self._connection_lock:
+            self._connection = connection
+        self._poll_event = self._scheduler.enter(0, 0, self._poll)
+        return 0
+
+    def stop(self, hard_stop: bool = False) -> int:
+        """Stop polling the store and stop the internal thread. The events
+        stay in the store for the other schedulers.
+
+        Args:
+            hard_stop (bool, optional): If set to `False`, wait until the
+                claimed events execute before stopping. If set to `True`, the
+                claimed events which didn't start executing are released for
+                the other schedulers.
+        Returns:
+            int: 0 if the event scheduler was successfully stopped, -1 if the
+            scheduler is already in the process of stopping/already stopped.
+        """
+        poll_event = self._poll_event
+        self._poll_event = None
+        if poll_event is not None:
+            self._scheduler.cancel(poll_event)
+        if self._scheduler.stop(hard_stop) != 0:
+            return -1
+        with self._connection_lock:
+            connection = self._connection
+            self._connection = None
+            connection.execute('UPDATE events SET owner = NULL, '
+                               'lease_expiry = NULL WHERE owner = ?',
+                               (self._owner,))
+            connection.close()
+        return 0
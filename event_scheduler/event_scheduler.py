@@ -1,19 +1,38 @@
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import partial
 import heapq
+import itertools
+import math
+from event_scheduler.fairness import DeficitRoundRobin
+from event_scheduler.limits import KeyLimit
+from event_scheduler.metrics import SchedulerMetrics
+from event_scheduler.periodic import PeriodicJobTable
+from event_scheduler.queues import HeapQueue
+import pickle
+from random import random
 import sys
 from time import monotonic
+from time import perf_counter
 from time import sleep
 import threading
 
 _sentinel = object()
 
+# Cancelled events are left in the queue as tombstones. Once the queue holds
+# more than this many entries and at least half of them are tombstones, the
+# queue is compacted.
+_COMPACTION_THRESHOLD = 1024
+
 # Designed using elements from sched.scheduler from
 # https://github.com/python/cpython/blob/3.8/Lib/sched.py
 
 
 class Event(namedtuple('Event',
-                       'time, priority, action, argument, kwargs, id')):
+                       'time, priority, action, argument, kwargs, id, key, '
+                       'max_lateness, slack, tenant, tags')):
     __slots__ = []
     def __eq__(s, o): return (s.time, s.priority) == (o.time, o.priority)
     def __lt__(s, o): return (s.time, s.priority) <  (o.time, o.priority)
@@ -33,6 +52,32 @@ arguments for the action.''')
 Event.kwargs.__doc__ = ('''kwargs is a dictionary holding the keyword
 arguments for the action.''')
 Event.id.__doc__ = '''id is a value used to identify recurring events.'''
+Event.key.__doc__ = ('''key is a hashable value the limits of the event
+scheduler apply to, None by default.''')
+Event.max_lateness.__doc__ = ('''max_lateness is the number of seconds after
+its time past which the event is shed instead of executed. None to use the
+event scheduler's default.''')
+Event.slack.__doc__ = ('''slack is the number of seconds the event may execute
+after its time, so it shares a wakeup of the event scheduler with other
+events. None to use the event scheduler's default.''')
+Event.tenant.__doc__ = ('''tenant is a hashable label the due events are shared
+by when the event scheduler has tenant weights, None by default.''')
+Event.tags.__doc__ = ('''tags is a frozenset of hashable labels the event can
+be looked up and cancelled by, None by default.''')
+Event.__new__.__defaults__ = (None, None, None, None, None)
+
+
+def _freeze_tags(tags):
+    """Return the tags of an event as a frozenset, None if it has none.
+
+    Raises:
+        ValueError: If tags is a string, which would tag the event with each
+            of its characters.
+    """
+    if isinstance(tags, (str, bytes)):
+        raise ValueError('The tags of an event must be an iterable of tags, '
+                         'not a string')
+    return frozenset(tags) if tags else None
 
 
 class SchedulerStatus(Enum):
@@ -41,6 +86,33 @@ class SchedulerStatus(Enum):
     STOPPED = 2
 
 
+class CatchUpPolicy(Enum):
+    """How a recurring event is rescheduled when the scheduler falls behind
+    its schedule.
+
+    FIRE_ALL executes every missed occurrence back-to-back, COALESCE executes
+    a single occurrence and skips ahead to the next occurrence in the future,
+    FIXED_DELAY schedules the next occurrence an interval after the action
+    completes.
+    """
+    FIRE_ALL = 0
+    COALESCE = 1
+    FIXED_DELAY = 2
+
+
+class KeyedMode(Enum):
+    """Which event stays pending when an event is entered with the key of
+    a pending keyed event.
+
+    DEBOUNCE replaces the pending event with the new one, THROTTLE keeps the
+    pending event and drops the new one, KEEP_EARLIEST keeps whichever occurs
+    first.
+    """
+    DEBOUNCE = 0
+    THROTTLE = 1
+    KEEP_EARLIEST = 2
+
+
 class EventScheduler:
     """
     The Event Scheduler is an always-on scheduler which is able to accept and
@@ -51,7 +123,26 @@ class EventScheduler:
     def __init__(self,
                  thread_name=None,
                  timefunc=monotonic,
-                 timer_class=threading.Timer):
+                 timer_class=None,
+                 executor=None,
+                 max_workers=None,
+                 queue_class=HeapQueue,
+                 max_processes=None,
+                 max_in_flight=None,
+                 done_callback=None,
+                 metrics=False,
+                 batch_dispatch=False,
+                 batch_handler=None,
+                 journal=None,
+                 index_actions=False,
+                 max_lateness=None,
+                 shed_callback=None,
+                 before_dispatch=None,
+                 after_dispatch=None,
+                 trace_sample_rate=1.0,
+                 watchdog=None,
+                 slack=None,
+                 tenant_weights=None):
         """
         Args:
             thread_name (str, optional): provide a string name for the internal
@@ -59,9 +150,102 @@ class EventScheduler:
             timefunc (optional): provide a timing function the event scheduler
             will rely on on to schedule events.
             timer_class (:obj:`threading.Timer`, optional): provide a timer
-            class which runs on the same time as timefunc
+            class which runs on the same time as timefunc. By default, no
+            timer is used and the internal thread waits on its condition
+            variable with a timeout until the soonest event is due.
+            executor (:obj:`concurrent.futures.Executor`, optional): provide
+            an executor the actions of due events are submitted to. Actions
+            are then executed outside of the scheduler's lock and the
+            internal thread only dispatches events. The executor is not shut
+            down when the scheduler stops.
+            max_workers (int, optional): if set and no executor is provided,
+            the scheduler owns a thread pool of this size to execute actions.
+            The pool is shut down when the scheduler stops.
+            queue_class (optional): provide the class of the queue holding
+            the scheduled events, either :obj:`queues.HeapQueue` or
+            :obj:`queues.TimingWheelQueue`.
+            max_processes (int, optional): if set and no executor is
+            provided, the scheduler owns a process pool of this size to
+            execute actions. The pool is shut down when the scheduler stops.
+            max_in_flight (int, optional): maximum number of actions submitted
+            to the executor which haven't completed yet. The internal thread
+            waits for an action to complete before dispatching more events
+            once the limit is reached.
+            done_callback (callable, optional): provide a function called with
+            the event and its :obj:`concurrent.futures.Future` once an action
+            submitted to the executor completes. Use it to get the results or
+            the exceptions of the actions.
+            metrics (bool, optional): if set to `True`, the scheduler counts
+            the events entered, cancelled and executed, and records how late
+            events are dispatched and how long their actions take. See
+            stats(). Disabled by default so it has no overhead.
+            batch_dispatch (bool, optional): if set to `True`, every event due
+            when the internal thread wakes up is popped under a single lock
+            acquisition and the batch is executed in order of time and
+            priority.
+            batch_handler (callable, optional): provide a function called
+            with the list of events of every batch instead of executing their
+            actions. Implies batch_dispatch. When the scheduler has an
+            executor, the handler is submitted once per batch and
+            done_callback receives the batch instead of an event.
+            journal (:obj:`journal.Journal`, optional): provide a journal to
+            persist the events whose action is in its registry. The pending
+            events of the journal are restored when the scheduler starts.
+            index_actions (bool, optional): if set to `True`, the pending
+            events are indexed by action so events_for_action() doesn't scan
+            the queue. Actions must then be hashable.
+            max_lateness (float, optional): provide the default number of
+            seconds after their time past which due events are shed instead
+            of executed, for the events entered without a max_lateness. By
+            default, events execute however late they are.
+            shed_callback (callable, optional): provide a function called
+            with every shed event, on the internal thread.
+            before_dispatch (callable, optional): provide a function called
+            with the event and the time (from timefunc) its action starts,
+            right before it's executed. The lag of the event is the start
+            time minus the time of the event. With a batch handler, the hook
+            receives the batch instead of an event.
+            after_dispatch (callable, optional): provide a function called
+            with the event, the time its action started and the number of
+            seconds it took, right after it's executed. Not called if the
+            action raises.
+            trace_sample_rate (float, optional): provide the fraction of the
+            executions for which the dispatch hooks are called, to bound
+            their overhead. Every execution is traced by default.
+            watchdog (:obj:`watchdog.Watchdog`, optional): provide a watchdog
+            reporting the actions executing for longer than its threshold.
+            Every execution is watched, whatever the sample rate.
+            slack (float, optional): provide the default number of seconds
+            events may execute after their time, for the events entered
+            without a slack. The internal thread then wakes up once for all
+            the events whose windows overlap instead of once per event. By
+            default, events execute as close to their time as possible.
+            tenant_weights (dict, optional): provide the weights of the
+            tenants (key: tenant, value: weight) to share the dispatch of due
+            events between the tenants of the events by weight, with deficit
+            round-robin, instead of dispatching them by time and priority.
+            Tenants without a weight have a weight of 1. Fairness is disabled
+            by default.
+
+        Raises:
+            ValueError: If both max_workers and max_processes are set, if
+                trace_sample_rate isn't between 0 and 1 or if the actions
+                executed on a process pool would be traced.
         """
-        self._queue = []
+        if max_workers is not None and max_processes is not None:
+            raise ValueError('Only one of max_workers and max_processes can '
+                             'be set')
+        if not 0 <= trace_sample_rate <= 1:
+            raise ValueError('trace_sample_rate must be between 0 and 1')
+        self._queue = queue_class()
+        # Sequence numbers of the queue entries, to break ties between events
+        # with the same time and priority
+        self._sequence = itertools.count()
+        # Events which are still pending in the queue, keyed by their
+        # identity. Cancelling an event only removes it from this dictionary,
+        # its entry in the queue becomes a tombstone which is discarded when it
+        # reaches the front of the queue or when the queue gets compacted.
+        self._pending = {}
         self._lock = threading.RLock()
         self.timefunc = timefunc
         self._scheduler_status = SchedulerStatus.STOPPED
@@ -73,25 +257,132 @@ class EventScheduler:
         # If we've looked at the front of the queue and the event isn't ready
         # to execute, we set a timer for the remaining time. If a new event is
         # added to the queue, then we cancel the timer and set it to None.
+        # Without a timer class, we wait on the condition variable for the
+        # remaining time instead.
         self._timer_class = timer_class
         self._timer = None
-        # dictionary to store all currently active recurring events (key: id,
+        # Actions are executed on the internal thread while holding the lock
+        # unless an executor is available.
+        self._executor = executor
+        self._owns_executor = False
+        if executor is None and max_workers is not None:
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix=thread_name or '')
+            self._owns_executor = True
+        elif executor is None and max_processes is not None:
+            self._executor = ProcessPoolExecutor(max_processes)
+            self._owns_executor = True
+        # Events are pickled to be sent to the worker processes, so make sure
+        # they can be when they're entered rather than when they're due.
+        self._check_pickle = isinstance(self._executor, ProcessPoolExecutor)
+        self._in_flight = None
+        if max_in_flight is not None:
+            self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._done_callback = done_callback
+        self._metrics = SchedulerMetrics() if metrics else None
+        self._batch_dispatch = batch_dispatch or batch_handler is not None
+        self._batch_handler = batch_handler
+        # The journal is only set while the scheduler is running
+        self._journal_config = journal
+        self._journal = None
+        # Pending events indexed by action (key: action, value: dictionary of
+        # the events keyed by their identity), None unless index_actions is
+        # set.
+        self._by_action = {} if index_actions else None
+        # Pending events indexed by tag (key: tag, value: dictionary of the
+        # events keyed by their identity)
+        self._by_tag = {}
+        self._max_lateness = max_lateness
+        self._shed_callback = shed_callback
+        self._slack = slack
+        # Heap of the deadlines of the queued events, the latest times they
+        # can execute, as tuples of (deadline, sequence number, event). The
+        # internal thread wakes up at the soonest deadline instead of the
+        # time of the event at the front of the queue. Only kept once an
+        # event has slack, None until then.
+        self._deadlines = [] if slack else None
+        # Due events waiting for the turn of their tenant, None unless
+        # tenant_weights is set.
+        self._fair = None
+        if tenant_weights is not None:
+            self._fair = DeficitRoundRobin(tenant_weights)
+        self._before_dispatch = before_dispatch
+        self._after_dispatch = after_dispatch
+        self._trace_sample_rate = trace_sample_rate
+        self._watchdog = watchdog
+        # Actions are called through _call_traced() when traced or watched,
+        # otherwise they're called directly so tracing has no overhead when
+        # it's disabled.
+        self._traced = before_dispatch is not None or \
+            after_dispatch is not None or watchdog is not None
+        if self._traced and self._check_pickle:
+            raise ValueError('The actions executed on a process pool can\'t '
+                             'be traced')
+        # Pending events entered with enterabs_keyed() (key: event key,
         # value: Event)
+        self._keyed = {}
+        # Limits on the executions of the events of a key (key: event key,
+        # value: KeyLimit)
+        self._limits = {}
+        # dictionary to store all currently active recurring events (key: id,
+        # value: (Event, interval, CatchUpPolicy))
         self._recurring_events = {}
+        # Number of occurrences skipped by the recurring events with the
+        # COALESCE policy (key: id, value: count)
+        self._skipped_ticks = {}
         # monotonically increasing counter to provide unique event_ids for
         # recurring events
         self._id_counter = 0
+        # Periodic jobs entered with enter_periodic(), None until the first
+        # one, and the queued internal event executing them at the time of
+        # the soonest job. The internal event isn't listed with the pending
+        # events.
+        self._periodic = None
+        self._periodic_event = None
+        # Set while the internal event executes the periodic jobs, it's
+        # entered again once they're done.
+        self._periodic_running = False
 
     def _notify(self):
         with self._cv:
             self._cv.notify()
 
+    def _check_picklable(self, action, arguments, kwargs):
+        if not self._check_pickle:
+            return
+        try:
+            pickle.dumps((action, arguments, kwargs))
+        except Exception as exc:
+            raise ValueError('The action and arguments of an event executed '
+                             'on a process pool must be picklable') from exc
+
+    def _on_done(self, event, started, future):
+        """Called once an action submitted to the executor completes."""
+        if self._metrics is not None:
+            with self._lock:
+                self._metrics.duration.record(perf_counter() - started)
+        if self._in_flight is not None:
+            self._in_flight.release()
+        batch = event if isinstance(event, list) else [event]
+        if self._limits or any(item.id for item in batch):
+            with self._lock:
+                if self._limits:
+                    self._release(batch)
+                self._reschedule_completed(batch)
+        if self._done_callback is not None:
+            self._done_callback(event, future)
+
     def enterabs(self,
                  time,
                  priority,
                  action,
                  arguments=(),
-                 kwargs=_sentinel) -> Event:
+                 kwargs=_sentinel,
+                 key=None,
+                 max_lateness=None,
+                 slack=None,
+                 tenant=None,
+                 tags=None) -> Event:
         """Enter a new event in the queue to occur at an absolute time.
 
         Args:
@@ -103,6 +394,18 @@ class EventScheduler:
                 executes.
             arguments (optional): Variable length argument list for the action.
             kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            key (hashable, optional): The key of the event, the limits set
+                with set_limit() for the key apply to the event.
+            max_lateness (float, optional): The number of seconds after its
+                scheduled time past which the event is shed instead of
+                executed. Defaults to the scheduler's max_lateness.
+            slack (float, optional): The number of seconds the event may
+                execute after its scheduled time, to share a wakeup with
+                other events. Defaults to the scheduler's slack.
+            tenant (hashable, optional): The tenant the event is dispatched
+                for, see the scheduler's tenant_weights.
+            tags (iterable, optional): Hashable labels to look up the event
+                with events_for_tag() and cancel it with cancel_tag().
 
         Returns:
             Event: The scheduled event if the scheduler is running, None
@@ -110,7 +413,9 @@ class EventScheduler:
             necessary.
 
         Raises:
-            ValueError: If the 0 > priority >= sys.maxsize
+            ValueError: If the 0 > priority >= sys.maxsize, if tags is a
+                string, or if the scheduler executes actions on a process
+                pool and the action or its arguments can't be pickled.
 
         Warning:
             Long running actions will stall the internal thread and may impact
@@ -121,24 +426,313 @@ class EventScheduler:
                              'less than sys.maxsize')
         if kwargs is _sentinel:
             kwargs = {}
+        self._check_picklable(action, arguments, kwargs)
         # Non-recurring events have an id of 0
-        event = Event(time, priority, action, arguments, kwargs, 0)
+        event = Event(time,
+                      priority,
+                      action,
+                      arguments,
+                      kwargs,
+                      0,
+                      key,
+                      max_lateness,
+                      slack,
+                      tenant,
+                      _freeze_tags(tags))
         with self._lock:
             if self._scheduler_status != SchedulerStatus.RUNNING:
                 return None
-            heapq.heappush(self._queue, event)
-            # We only want to notify the event thread if the inserted event is
-            # in the front of the queue
-            if event == self._queue[0]:
-                self._notify()
+            self._enter(event)
         return event  # The ID
 
+    def _enter(self, event):
+        """Enter a new one-shot event in the queue. Only executed while
+        holding the queue lock.
+        """
+        journal = self._journal
+        record = journal.encode(event) if journal is not None else None
+        at_front = self._push(event)
+        if record is not None:
+            journal.entered(event, record)
+        if self._metrics is not None:
+            self._metrics.entered += 1
+        # We only want to notify the event thread if the inserted event is in
+        # the front of the queue
+        if at_front:
+            self._notify()
+
+    def enterabs_keyed(self,
+                       key,
+                       time,
+                       priority,
+                       action,
+                       arguments=(),
+                       kwargs=_sentinel,
+                       mode=KeyedMode.DEBOUNCE,
+                       max_lateness=None,
+                       slack=None,
+                       tenant=None,
+                       tags=None) -> Event:
+        """Enter a new event in the queue to occur at an absolute time, at
+        most one event entered with this method is pending per key. If an
+        event is already pending for the key, the mode decides which one
+        stays in the queue. Replacing an event is O(log n).
+
+        Args:
+            key (hashable): The key of the event, the limits set with
+                set_limit() for the key also apply to the event.
+            time: The absolute time the event will be scheduled to execute.
+            priority (int): The priority the event will execute with.
+            action (callable): The function which will invoked when the event
+                executes.
+            arguments (optional): Variable length argument list for the action.
+            kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            mode (:obj:`KeyedMode`, optional): DEBOUNCE replaces the pending
+                event, THROTTLE keeps the pending event and KEEP_EARLIEST
+                keeps whichever event occurs first.
+            max_lateness (float, optional): The number of seconds after its
+                scheduled time past which the event is shed instead of
+                executed. Defaults to the scheduler's max_lateness.
+            slack (float, optional): The number of seconds the event may
+                execute after its scheduled time, to share a wakeup with
+                other events. Defaults to the scheduler's slack.
+            tenant (hashable, optional): The tenant the event is dispatched
+                for, see the scheduler's tenant_weights.
+            tags (iterable, optional): Hashable labels to look up the event
+                with events_for_tag() and cancel it with cancel_tag().
+
+        Returns:
+            Event: The event pending for the key if the scheduler is running,
+            None otherwise. It's the event which was already pending if the
+            new one was dropped.
+
+        Raises:
+            ValueError: If the key is None, if the 0 > priority >=
+                sys.maxsize, if tags is a string, or if the scheduler executes
+                actions on a process pool and the action or its arguments
+                can't be pickled.
+        """
+        if key is None:
+            raise ValueError('The key of a keyed event can\'t be None')
+        if priority >= sys.maxsize or priority < 0:
+            raise ValueError('Priority must be equal to or greater than 0 and '
+                             'less than sys.maxsize')
+        if kwargs is _sentinel:
+            kwargs = {}
+        self._check_picklable(action, arguments, kwargs)
+        event = Event(time,
+                      priority,
+                      action,
+                      arguments,
+                      kwargs,
+                      0,
+                      key,
+                      max_lateness,
+                      slack,
+                      tenant,
+                      _freeze_tags(tags))
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return None
+            current = self._keyed.get(key)
+            if current is not None:
+                if mode == KeyedMode.THROTTLE or \
+                        (mode == KeyedMode.KEEP_EARLIEST and
+                         current <= event):
+                    return current
+                self._discard(current)
+            self._keyed[key] = event
+            self._enter(event)
+        return event
+
+    def enter_keyed(self,
+                    key,
+                    delay,
+                    priority,
+                    action,
+                    arguments=(),
+                    kwargs=_sentinel,
+                    mode=KeyedMode.DEBOUNCE,
+                    max_lateness=None,
+                    slack=None,
+                    tenant=None,
+                    tags=None) -> Event:
+        """Enter a new event in the queue to occur at a time relative to the
+        current time, at most one event entered with this method is pending
+        per key. See enterabs_keyed().
+
+        Returns:
+            Event: The event pending for the key if the scheduler is running,
+            None otherwise.
+        """
+        return self.enterabs_keyed(key,
+                                   self.timefunc() + delay,
+                                   priority,
+                                   action,
+                                   arguments,
+                                   kwargs,
+                                   mode,
+                                   max_lateness,
+                                   slack,
+                                   tenant,
+                                   tags)
+
+    def reschedule(self, event: Event, time) -> Event:
+        """Move a pending one-shot event to a new absolute time in
+        O(log n).
+
+        Args:
+            event: The event returned by enter()/enterabs().
+            time: The new absolute time of the event.
+
+        Returns:
+            Event: The moved event, which replaces the given one to cancel or
+            reschedule it later. None if the event isn't pending or the
+            scheduler isn't running.
+
+        Raises:
+            ValueError: If the event is a recurring event.
+        """
+        if event.id:
+            raise ValueError('Recurring events can\'t be rescheduled')
+        moved = event._replace(time=time)
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return None
+            keyed = self._keyed.get(event.key) is event
+            if not self._discard(event):
+                return None
+            if keyed:
+                self._keyed[event.key] = moved
+            self._enter(moved)
+        return moved
+
+    def enterabs_many(self, events) -> list:
+        """Enter a batch of new events in the queue to occur at absolute
+        times. The whole batch is inserted at once, which is much cheaper than
+        calling enterabs() for every event.
+
+        Args:
+            events (iterable): Tuples of (time, priority, action[, arguments[,
+                kwargs[, key[, max_lateness[, slack[, tenant[, tags]]]]]]])
+                with the same meaning as the arguments of enterabs().
+
+        Returns:
+            list: The scheduled events in the order they were given if the
+            scheduler is running, None otherwise.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize or the tags are a
+                string for any of the events, or if the scheduler executes
+                actions on a process pool and an action or its arguments can't
+                be pickled. None of the events are scheduled in that case.
+
+        Warning:
+            Long running actions will stall the internal thread and may impact
+            the scheduling of other events.
+        """
+        batch = []
+        for time, priority, action, *rest in events:
+            if priority >= sys.maxsize or priority < 0:
+                raise ValueError('Priority must be equal to or greater than 0 '
+                                 'and less than sys.maxsize')
+            arguments = rest[0] if rest else ()
+            kwargs = rest[1] if len(rest) > 1 else {}
+            key = rest[2] if len(rest) > 2 else None
+            max_lateness = rest[3] if len(rest) > 3 else None
+            slack = rest[4] if len(rest) > 4 else None
+            tenant = rest[5] if len(rest) > 5 else None
+            tags = rest[6] if len(rest) > 6 else None
+            self._check_picklable(action, arguments, kwargs)
+            batch.append(Event(time,
+                               priority,
+                               action,
+                               arguments,
+                               kwargs,
+                               0,
+                               key,
+                               max_lateness,
+                               slack,
+                               tenant,
+                               _freeze_tags(tags)))
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return None
+            if not batch:
+                return batch
+            journal = self._journal
+            if journal is not None:
+                records = [journal.encode(event) for event in batch]
+            head = self._queue.peek()
+            sequence = self._sequence
+            entries = [(event.time, event.priority, next(sequence), event)
+                       for event in batch]
+            self._queue.push_many(entries)
+            pending = self._pending
+            for event in batch:
+                pending[id(event)] = event
+            soonest = False
+            if self._deadlines is not None or \
+                    any(event.slack for event in batch):
+                for entry in entries:
+                    soonest = self._track_deadline(entry) or soonest
+            if self._by_action is not None:
+                for event in batch:
+                    self._index(event)
+            for event in batch:
+                if event.tags:
+                    self._index_tags(event)
+            if journal is not None:
+                for event, record in zip(batch, records):
+                    if record is not None:
+                        journal.entered(event, record)
+            if self._metrics is not None:
+                self._metrics.entered += len(batch)
+            # Only wake up the event thread once, if the front of the queue
+            # or the soonest deadline changed
+            if self._queue.peek() is not head or soonest:
+                self._notify()
+        return batch
+
+    def enter_many(self, events) -> list:
+        """Enter a batch of new events in the queue to occur at times
+        relative to the current time. All the delays are relative to the same
+        current time.
+
+        Args:
+            events (iterable): Tuples of (delay, priority, action[, arguments[,
+                kwargs[, key[, max_lateness[, slack[, tenant[, tags]]]]]]])
+                with the same meaning as the arguments of enter().
+
+        Returns:
+            list: The scheduled events in the order they were given if the
+            scheduler is running, None otherwise.
+
+        Raises:
+            ValueError: If the 0 > priority >= sys.maxsize or the tags are a
+                string for any of the events, or if the scheduler executes
+                actions on a process pool and an action or its arguments can't
+                be pickled. None of the events are scheduled in that case.
+
+        Warning:
+            Long running actions will stall the internal thread and may impact
+            the scheduling of other events.
+        """
+        now = self.timefunc()
+        return self.enterabs_many((now + delay, *rest)
+                                  for delay, *rest in events)
+
     def enter(self,
               delay,
               priority,
               action,
               arguments=(),
-              kwargs=_sentinel) -> Event:
+              kwargs=_sentinel,
+              key=None,
+              max_lateness=None,
+              slack=None,
+              tenant=None,
+              tags=None) -> Event:
         """ Enter a new event in the queue to occur at a time relative to the
         current time.
 
@@ -153,6 +747,18 @@ class EventScheduler:
                 executes.
             arguments (optional): Variable length argument list for the action.
             kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            key (hashable, optional): The key of the event, the limits set
+                with set_limit() for the key apply to the event.
+            max_lateness (float, optional): The number of seconds after its
+                scheduled time past which the event is shed instead of
+                executed. Defaults to the scheduler's max_lateness.
+            slack (float, optional): The number of seconds the event may
+                execute after its scheduled time, to share a wakeup with
+                other events. Defaults to the scheduler's slack.
+            tenant (hashable, optional): The tenant the event is dispatched
+                for, see the scheduler's tenant_weights.
+            tags (iterable, optional): Hashable labels to look up the event
+                with events_for_tag() and cancel it with cancel_tag().
 
         Returns:
             Event: The scheduled event if the scheduler is running, None
@@ -160,7 +766,9 @@ class EventScheduler:
             necessary.
 
         Raises:
-            ValueError: If the 0 > priority >= sys.maxsize
+            ValueError: If the 0 > priority >= sys.maxsize, if tags is a
+                string, or if the scheduler executes actions on a process
+                pool and the action or its arguments can't be pickled.
 
         Warning:
             Long running actions will stall the internal thread and may impact
@@ -170,14 +778,29 @@ class EventScheduler:
             raise ValueError('Priority must be equal to or greater than 0 and '
                              'less than sys.maxsize')
         time = self.timefunc() + delay
-        return self.enterabs(time, priority, action, arguments, kwargs)
+        return self.enterabs(time,
+                             priority,
+                             action,
+                             arguments,
+                             kwargs,
+                             key,
+                             max_lateness,
+                             slack,
+                             tenant,
+                             tags)
 
     def enter_recurring(self,
                         interval,
                         priority,
                         action,
                         arguments=(),
-                        kwargs=_sentinel) -> int:
+                        kwargs=_sentinel,
+                        catch_up=CatchUpPolicy.FIRE_ALL,
+                        key=None,
+                        max_lateness=None,
+                        slack=None,
+                        tenant=None,
+                        tags=None) -> int:
         """Enter a new recurring event in the queue to occur at a specified
         interval.
 
@@ -193,6 +816,21 @@ class EventScheduler:
                 executes.
             arguments (optional): Variable length argument list for the action.
             kwargs (:obj:`dict`, optional): Keyword arguments for the action.
+            catch_up (:obj:`CatchUpPolicy`, optional): How the event is
+                rescheduled when the scheduler falls behind. By default every
+                missed occurrence is executed.
+            key (hashable, optional): The key of the event, the limits set
+                with set_limit() for the key apply to the event.
+            max_lateness (float, optional): The number of seconds after its
+                scheduled time past which the event is shed instead of
+                executed. Defaults to the scheduler's max_lateness.
+            slack (float, optional): The number of seconds the event may
+                execute after its scheduled time, to share a wakeup with
+                other events. Defaults to the scheduler's slack.
+            tenant (hashable, optional): The tenant the event is dispatched
+                for, see the scheduler's tenant_weights.
+            tags (iterable, optional): Hashable labels to look up the event
+                with events_for_tag() and cancel it with cancel_tag().
 
         Returns:
             int: An event id of the recurring event if the scheduler is
@@ -200,7 +838,9 @@ class EventScheduler:
             later, if necessary.
 
         Raises:
-            ValueError: If the 0 > priority >= sys.maxsize
+            ValueError: If the 0 > priority >= sys.maxsize, if tags is a
+                string, or if the scheduler executes actions on a process
+                pool and the action or its arguments can't be pickled.
 
         Warning:
             Long running actions will stall the internal thread and may impact
@@ -211,6 +851,8 @@ class EventScheduler:
                              'less than sys.maxsize')
         if kwargs is _sentinel:
             kwargs = {}
+        self._check_picklable(action, arguments, kwargs)
+        tags = _freeze_tags(tags)
         with self._lock:
             if self._scheduler_status != SchedulerStatus.RUNNING:
                 return None
@@ -221,36 +863,458 @@ class EventScheduler:
                           action,
                           arguments,
                           kwargs,
-                          self._id_counter)
-            self._recurring_events[self._id_counter] = (event, interval)
-            heapq.heappush(self._queue, event)
+                          self._id_counter,
+                          key,
+                          max_lateness,
+                          slack,
+                          tenant,
+                          tags)
+            journal = self._journal
+            if journal is not None:
+                record = journal.encode(event, interval, catch_up.value)
+            self._recurring_events[self._id_counter] = (event,
+                                                        interval,
+                                                        catch_up)
+            at_front = self._push(event)
+            if journal is not None and record is not None:
+                journal.entered(event, record)
+            if self._metrics is not None:
+                self._metrics.entered += 1
             # We only want to notify the event thread if the inserted event is
             # in the front of the queue
-            if event == self._queue[0]:
+            if at_front:
                 self._notify()
             return self._id_counter
 
-    def _reschedule_recurring(self, *args):
-        """Logic to reschedule a recurring event. Only executed from the event
-        scheduler thread while holding the queue lock.
+    def enter_periodic(self,
+                       interval,
+                       priority,
+                       action,
+                       arguments=()) -> int:
+        """Enter a new periodic job to execute action(*arguments) every
+        interval seconds, starting interval seconds from now. Jobs aren't
+        events: they're a few numbers in a :obj:`periodic.PeriodicJobTable`
+        and a single internal event executes the due jobs one after the
+        other, rescheduling them in place. Use it instead of
+        enter_recurring() for very large numbers of periodic actions.
+
+        Jobs which fall behind execute every missed occurrence, like the
+        FIRE_ALL policy, regardless of max_lateness. They aren't listed with
+        the pending events, they aren't journaled and they're removed when the
+        scheduler stops.
+
+        Args:
+            interval: The interval time the job will be scheduled to execute.
+            priority (int): The priority the job will execute with.
+            action (callable): The function which will invoked when the job
+                executes.
+            arguments (optional): Variable length argument list for the action.
+
+        Returns:
+            int: The id of the job if the scheduler is running, None
+            otherwise. This id can be used to cancel the job later.
+
+        Raises:
+            ValueError: If interval isn't greater than 0, if the 0 > priority
+                >= sys.maxsize, or if the scheduler has a batch handler or
+                executes actions on a process pool.
         """
-        time, priority, action, argument, kwargs, event_id = args
-        if event_id in self._recurring_events and \
-                self._scheduler_status == SchedulerStatus.RUNNING:
-            interval = self._recurring_events[event_id][1]
-            # We do the scheduling based on the previous execution time
-            event = Event(interval + time,
-                          priority,
-                          action,
-                          argument,
-                          kwargs,
-                          event_id)
-            self._recurring_events[event_id] = (event, interval)
-            heapq.heappush(self._queue, event)
+        if interval <= 0:
+            raise ValueError('The interval of a periodic job must be greater '
+                             'than 0')
+        if priority >= sys.maxsize or priority < 0:
+            raise ValueError('Priority must be equal to or greater than 0 and '
+                             'less than sys.maxsize')
+        if self._batch_handler is not None or self._check_pickle:
+            raise ValueError('Periodic jobs can\'t be executed by a batch '
+                             'handler or on a process pool')
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return None
+            if self._periodic is None:
+                self._periodic = PeriodicJobTable()
+            job_id = self._periodic.add(self.timefunc() + interval,
+                                        interval,
+                                        priority,
+                                        action,
+                                        arguments)
+            self._arm_periodic()
+            return job_id
+
+    def cancel_periodic(self, job_id) -> int:
+        """Remove a periodic job using the id returned by enter_periodic().
+        If the job doesn't exist, this is a no-op.
+
+        Args:
+            job_id (int): The id of the periodic job to be cancelled.
+
+        Returns:
+            int: 0 if the job was successfully removed/didn't exist, -1
+            otherwise.
+        """
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return -1
+            if self._periodic is not None:
+                # The internal event may execute early and find no due job
+                self._periodic.remove(job_id)
+            return 0
+
+    def _arm_periodic(self):
+        """Enter the internal event executing the periodic jobs at the time of
+        the soonest job, or move it there. Only executed while holding the
+        queue lock.
+        """
+        if self._periodic_running:
+            return
+        table = self._periodic
+        job = table.peek()
+        if job < 0:
+            return
+        time = table.times[job]
+        event = self._periodic_event
+        if event is not None:
+            if event.time <= time:
+                return
+            self._forget(event)
+        # The jobs aren't shed, they execute every missed occurrence
+        event = Event(time, table.priorities[job], self._run_periodic, (), {},
+                      0, None, math.inf)
+        self._periodic_event = event
+        if self._push(event):
+            self._notify()
+
+    def _run_periodic(self):
+        """Execute the periodic jobs which are due, the action of the internal
+        periodic event. The actions are called without holding the queue lock
+        when the scheduler has an executor.
+        """
+        now = self.timefunc()
+        try:
+            while True:
+                with self._lock:
+                    table = self._periodic
+                    job = table.pop_due(now)
+                    if job < 0:
+                        return
+                    action = table.actions[table.action_indexes[job]]
+                    arguments = table.arguments[job]
+                action(*arguments)
+        finally:
+            with self._lock:
+                self._periodic_running = False
+                if self._scheduler_status == SchedulerStatus.RUNNING:
+                    self._arm_periodic()
+
+    def _stop_periodic(self):
+        """Remove the periodic jobs and their internal event when the
+        scheduler stops, a soft stop doesn't wait for their next occurrence.
+        Only executed while holding the queue lock.
+        """
+        if self._periodic is None:
+            return
+        self._periodic.clear()
+        if self._periodic_event is not None:
+            self._forget(self._periodic_event)
+            self._periodic_event = None
+
+    def _reschedule_recurring(self, event, now):
+        """Logic to reschedule a recurring event when it's popped from the
+        queue at `now`. Only executed from the event scheduler thread while
+        holding the queue lock.
+        """
+        recurring = self._recurring_events.get(event.id)
+        if recurring is None or \
+                self._scheduler_status != SchedulerStatus.RUNNING:
+            return
+        _, interval, catch_up = recurring
+        if catch_up == CatchUpPolicy.FIXED_DELAY:
+            # Rescheduled once its action completes
+            return
+        # We do the scheduling based on the previous execution time
+        time = event.time + interval
+        if catch_up == CatchUpPolicy.COALESCE and time <= now:
+            # This execution stands for the occurrences which are already
+            # due, skip ahead to the next one in the future.
+            skipped = int((now - event.time) // interval)
+            time = event.time + (skipped + 1) * interval
+            self._skipped_ticks[event.id] = \
+                self._skipped_ticks.get(event.id, 0) + skipped
+            if self._metrics is not None:
+                self._metrics.skipped_ticks += skipped
+        event = event._replace(time=time)
+        self._recurring_events[event.id] = (event, interval, catch_up)
+        self._push(event)
+
+    def _reschedule_completed(self, batch):
+        """Reschedule the recurring events of a batch with the FIXED_DELAY
+        policy once their actions completed. Only executed while holding the
+        queue lock.
+        """
+        if self._scheduler_status != SchedulerStatus.RUNNING:
+            return
+        now = self.timefunc()
+        for event in batch:
+            recurring = self._recurring_events.get(event.id)
+            # The event may have been cancelled while its action executed
+            if recurring is None or recurring[0] is not event or \
+                    recurring[2] != CatchUpPolicy.FIXED_DELAY:
+                continue
+            _, interval, catch_up = recurring
+            event = event._replace(time=now + interval)
+            self._recurring_events[event.id] = (event, interval, catch_up)
+            if self._push(event):
+                self._notify()
+
+    def _push(self, event) -> bool:
+        """Add an event to the queue. Only executed while holding the queue
+        lock.
+
+        Queue entries are tuples of (time, priority, sequence number, event)
+        which compare natively, and events with the same time and priority
+        are executed in the order they were entered.
+
+        Returns:
+            bool: True if the event is at the front of the queue or has the
+            soonest deadline.
+        """
+        entry = (event.time, event.priority, next(self._sequence), event)
+        self._queue.push(entry)
+        self._pending[id(event)] = event
+        if self._by_action is not None:
+            self._index(event)
+        if event.tags:
+            self._index_tags(event)
+        soonest = False
+        if self._deadlines is not None or event.slack:
+            soonest = self._track_deadline(entry)
+        return self._queue.peek() is entry or soonest
+
+    def _track_deadline(self, entry) -> bool:
+        """Add the deadline of a queue entry to the heap of deadlines. Only
+        executed while holding the queue lock.
+
+        Returns:
+            bool: True if it's the soonest deadline.
+        """
+        event = entry[3]
+        deadlines = self._deadlines
+        if deadlines is None:
+            # The first event with slack, the scheduler has no default slack
+            # so the deadlines of the queued events only depend on their own.
+            deadlines = [(queued[0] + (queued[3].slack or 0),
+                          queued[2],
+                          queued[3])
+                         for queued in self._queue]
+            heapq.heapify(deadlines)
+            self._deadlines = deadlines
+            return deadlines[0][2] is event
+        slack = event.slack
+        if slack is None:
+            slack = self._slack or 0
+        deadline = (entry[0] + slack, entry[2], event)
+        heapq.heappush(deadlines, deadline)
+        return deadlines[0] is deadline
+
+    def _wakeup_time(self, time):
+        """Return the time the internal thread wakes up at when the event at
+        the front of the queue is due at `time`: the soonest deadline of the
+        queued events. Only executed while holding the queue lock.
+        """
+        deadlines = self._deadlines
+        if deadlines is None:
+            return time
+        pending = self._pending
+        # Deadlines before the front of the queue belong to events which were
+        # deferred or parked since, their entries were replaced.
+        while deadlines and (deadlines[0][0] < time or
+                             id(deadlines[0][2]) not in pending):
+            heapq.heappop(deadlines)
+        return deadlines[0][0] if deadlines else time
+
+    def _index(self, event):
+        self._by_action.setdefault(event.action, {})[id(event)] = event
+
+    def _index_tags(self, event):
+        for tag in event.tags:
+            self._by_tag.setdefault(tag, {})[id(event)] = event
+
+    def _forget(self, event):
+        """Remove an event from the pending events, its entry is left in the
+        queue. Only executed while holding the queue lock.
+        """
+        del self._pending[id(event)]
+        keyed = self._keyed
+        if keyed and keyed.get(event.key) is event:
+            del keyed[event.key]
+        by_action = self._by_action
+        if by_action is not None:
+            events = by_action[event.action]
+            del events[id(event)]
+            if not events:
+                del by_action[event.action]
+        if event.tags:
+            by_tag = self._by_tag
+            for tag in event.tags:
+                events = by_tag[tag]
+                del events[id(event)]
+                if not events:
+                    del by_tag[tag]
+        deadlines = self._deadlines
+        if deadlines:
+            pending = self._pending
+            if not pending:
+                deadlines.clear()
+            elif len(deadlines) > 2 * len(pending) + 16:
+                self._compact_deadlines()
+
+    def _compact_deadlines(self):
+        """Drop the deadlines of the events which left the queue, and the
+        earlier deadlines of the events deferred since. Only executed while
+        holding the queue lock.
+        """
+        pending = self._pending
+        latest = {}
+        for deadline in self._deadlines:
+            key = id(deadline[2])
+            if key in pending and (key not in latest or
+                                   latest[key][0] < deadline[0]):
+                latest[key] = deadline
+        self._deadlines[:] = latest.values()
+        heapq.heapify(self._deadlines)
+
+    def _discard(self, event):
+        """Mark a queued event as cancelled. Only executed while holding the
+        queue lock.
+
+        Returns:
+            bool: True if the event was pending, False otherwise.
+        """
+        if self._pending.get(id(event)) is not event:
+            return False
+        self._forget(event)
+        if self._journal is not None:
+            self._journal.removed(event)
+        if self._metrics is not None:
+            self._metrics.cancelled += 1
+        # Events waiting for an execution of their key to complete aren't in
+        # the queue
+        if self._queue and self._queue.peek()[3] is event:
+            self._notify()
+        queue_size = len(self._queue)
+        if queue_size > _COMPACTION_THRESHOLD and \
+                len(self._pending) * 2 < queue_size:
+            pending = self._pending
+            self._queue.compact(lambda entry: id(entry[3]) in pending)
+        return True
+
+    def set_limit(self, key, max_concurrent=None, rate=None, burst=1):
+        """Limit the executions of the events entered with a key. Due events
+        exceeding a limit stay in the scheduler's queue until the limit allows
+        them to execute, the internal thread keeps dispatching the events of
+        other keys meanwhile. If neither max_concurrent nor rate is set, the
+        limits of the key are removed.
+
+        Args:
+            key (hashable): The key of the events.
+            max_concurrent (int, optional): The maximum number of actions of
+                the key executing at the same time. Only useful when actions
+                are executed on an executor or in batches.
+            rate (float, optional): The maximum number of executions per
+                second, enforced with a token bucket.
+            burst (int, optional): The number of executions allowed at once
+                when the key was idle, the capacity of the token bucket.
+
+        Raises:
+            ValueError: If the key is None, or if max_concurrent, rate or
+                burst isn't positive.
+        """
+        if key is None:
+            raise ValueError('The key of a limit can\'t be None')
+        limit = None
+        if max_concurrent is not None or rate is not None:
+            limit = KeyLimit(max_concurrent, rate, burst)
+        with self._lock:
+            previous = self._limits.pop(key, None)
+            if limit is not None:
+                self._limits[key] = limit
+            if previous is None:
+                return
+            if limit is not None:
+                limit.running = previous.running
+            # The events waiting for the previous limit are entered again and
+            # checked against the new one
+            pending = self._pending
+            for entry in previous.parked:
+                if id(entry[3]) in pending:
+                    self._queue.push(entry)
+                    if self._deadlines is not None:
+                        self._track_deadline(entry)
+            self._notify()
+
+    def set_weight(self, tenant, weight):
+        """Set the weight of a tenant, the share of the dispatch of due
+        events its events get when several tenants have due events.
+
+        Args:
+            tenant (hashable): The tenant of the events.
+            weight (float): The weight of the tenant, 1 by default.
+
+        Raises:
+            ValueError: If the scheduler has no tenant_weights or if weight
+                isn't greater than 0.
+        """
+        if self._fair is None:
+            raise ValueError('The event scheduler must have tenant_weights '
+                             'to set the weight of a tenant')
+        with self._lock:
+            self._fair.set_weight(tenant, weight)
+
+    def _release(self, batch):
+        """Release the limits of the keys of a batch of events whose actions
+        completed, and enter again the events waiting for them. Only executed
+        while holding the queue lock.
+        """
+        limits = self._limits
+        pending = self._pending
+        for event in batch:
+            limit = limits.get(event.key)
+            # The limit may have been set while the action executed
+            if limit is None or not limit.running:
+                continue
+            limit.running -= 1
+            parked = limit.parked
+            while parked:
+                entry = parked.popleft()
+                if id(entry[3]) in pending:
+                    self._queue.push(entry)
+                    soonest = self._deadlines is not None and \
+                        self._track_deadline(entry)
+                    if self._queue.peek() is entry or soonest:
+                        self._notify()
+                    break
+
+    def _defer_termination(self):
+        """Move the terminating event after the events deferred by the limits
+        of their key, or wait for the events waiting for an execution of
+        their key to complete. Only executed from the event scheduler thread
+        while holding the queue lock.
+        """
+        pending = self._pending
+        times = [entry[0] for entry in self._queue
+                 if id(entry[3]) in pending and entry[1] != sys.maxsize]
+        if not times:
+            self._cv.wait()
+            return
+        event = self._queue.pop()[3]
+        self._forget(event)
+        self._push(event._replace(time=max(times)))
 
     def cancel(self, event: Event) -> int:
         """Remove an event from the queue using the id returned by
         enter()/enterabs(). If the event is not in the queue, this is a no-op.
+        Cancellation is O(1) amortized, the cancelled event is lazily removed
+        from the queue.
 
         Args:
             event: The event to be cancelled.
@@ -262,13 +1326,7 @@ class EventScheduler:
         with self._lock:
             if self._scheduler_status != SchedulerStatus.RUNNING:
                 return -1
-            try:
-                if self._queue and self._queue[0] == event:
-                    self._notify()
-                self._queue.remove(event)
-                heapq.heapify(self._queue)
-            except ValueError:
-                pass
+            self._discard(event)
         return 0
 
     def cancel_recurring(self, event_id) -> int:
@@ -290,12 +1348,39 @@ class EventScheduler:
                 return 0
             event = self._recurring_events[event_id][0]
             del self._recurring_events[event_id]
-            if self._queue and self._queue[0] == event:
-                self._notify()
-            self._queue.remove(event)
-            heapq.heapify(self._queue)
+            self._skipped_ticks.pop(event_id, None)
+            if self._journal is not None:
+                self._journal.removed_recurring(event_id)
+            self._discard(event)
             return 0
 
+    def cancel_tag(self, tag) -> int:
+        """Remove the events entered with a tag from the queue, recurring
+        events included. Costs O(k) amortized for k events with the tag,
+        whatever the size of the queue. A recurring event with the
+        FIXED_DELAY policy whose action is executing isn't pending, cancel it
+        with cancel_recurring().
+
+        Args:
+            tag (hashable): The tag of the events to be cancelled.
+
+        Returns:
+            int: The number of events cancelled, -1 if the scheduler isn't
+            running.
+        """
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return -1
+            events = list(self._by_tag.get(tag, {}).values())
+            for event in events:
+                if event.id:
+                    self._recurring_events.pop(event.id, None)
+                    self._skipped_ticks.pop(event.id, None)
+                    if self._journal is not None:
+                        self._journal.removed_recurring(event.id)
+                self._discard(event)
+            return len(events)
+
     def cancel_all(self) -> int:
         """Clear all events from the queue. If the queue is already empty, this
         is a no-op.
@@ -306,20 +1391,229 @@ class EventScheduler:
         with self._lock:
             if self._scheduler_status != SchedulerStatus.RUNNING:
                 return -1
-            if self._queue:
-                self._queue.clear()
+            self._queue.clear()
+            if self._metrics is not None:
+                self._metrics.cancelled += len(self)
+            self._pending.clear()
+            self._keyed.clear()
+            if self._by_action is not None:
+                self._by_action.clear()
+            self._by_tag.clear()
+            for limit in self._limits.values():
+                limit.parked.clear()
+            if self._fair is not None:
+                self._fair.clear()
+            if self._deadlines is not None:
+                self._deadlines.clear()
+            if self._journal is not None:
+                self._journal.cleared()
             if self._timer:
                 self._timer.cancel()
                 self._timer = None
             self._recurring_events.clear()
+            self._skipped_ticks.clear()
+            if self._periodic is not None:
+                self._periodic.clear()
+            self._periodic_event = None
         return 0
 
+    def _take_due(self, now):
+        """Pop the events to dispatch from the queue: the event at the front of
+        the queue, or every event due at `now` when dispatching in batches.
+        Due events exceeding the limits of their key are deferred instead, and
+        due events later than their max lateness are shed. With tenant
+        weights, the due events are moved to the flows of their tenants and
+        taken in deficit round-robin order instead.
+        Only executed from the event scheduler thread while holding the queue
+        lock.
+
+        Returns:
+            list: The events to dispatch, ordered by time and priority or by
+            turn of their tenants.
+        """
+        q = self._queue
+        pending = self._pending
+        limits = self._limits
+        fair = self._fair
+        if fair is not None:
+            while q:
+                time, priority, _, event = q.peek()
+                if id(event) not in pending:
+                    q.pop()
+                    continue
+                if time > now or priority == sys.maxsize:
+                    break
+                fair.push(q.pop())
+        batch = []
+        while True:
+            if fair is not None:
+                if not fair:
+                    break
+                entry = fair.pop()
+                event = entry[3]
+                if id(event) not in pending:
+                    continue
+            else:
+                if not q:
+                    break
+                time, priority, _, event = q.peek()
+                if id(event) not in pending:
+                    q.pop()
+                    continue
+                if time > now or priority == sys.maxsize:
+                    break
+                # Take out the event from the queue since it's ready to
+                # execute
+                entry = q.pop()
+            max_lateness = event.max_lateness
+            if max_lateness is None:
+                max_lateness = self._max_lateness
+            if max_lateness is not None and now - event.time > max_lateness:
+                self._shed(event, now)
+                continue
+            if limits and event.key in limits:
+                limit = limits[event.key]
+                if limit.saturated():
+                    # Entered again once an action of the key completes
+                    limit.parked.append(entry)
+                    continue
+                delay = limit.delay(now)
+                if delay:
+                    # Deferred until the bucket of the key holds a token
+                    entry = (now + delay,) + entry[1:]
+                    q.push(entry)
+                    if self._deadlines is not None:
+                        self._track_deadline(entry)
+                    continue
+                limit.acquire()
+            self._forget(event)
+            if event.id:
+                self._reschedule_recurring(event, now)
+            elif event is self._periodic_event:
+                self._periodic_event = None
+                self._periodic_running = True
+            elif self._journal is not None:
+                self._journal.removed(event)
+            batch.append(event)
+            if not self._batch_dispatch:
+                break
+        metrics = self._metrics
+        if metrics is not None:
+            metrics.executed += len(batch)
+            for event in batch:
+                metrics.lag.record(now - event.time)
+        return batch
+
+    def _shed(self, event, now):
+        """Drop a due event which is later than its max lateness. Recurring
+        events are rescheduled. Only executed from the event scheduler thread
+        while holding the queue lock.
+        """
+        self._forget(event)
+        if event.id:
+            self._reschedule_recurring(event, now)
+            # Nothing completes for FIXED_DELAY events
+            self._reschedule_completed([event])
+        elif self._journal is not None:
+            self._journal.removed(event)
+        if self._metrics is not None:
+            self._metrics.shed += 1
+        if self._shed_callback is not None:
+            self._shed_callback(event)
+
+    def _execute(self, batch):
+        """Execute the actions of a batch of events on the event scheduler
+        thread, or hand the batch to the batch handler.
+        """
+        metrics = self._metrics
+        if self._traced:
+            for subject, action, argument, kwargs in self._jobs(batch):
+                started = perf_counter()
+                self._call_traced(subject, action, argument, kwargs)
+                if metrics is not None:
+                    metrics.duration.record(perf_counter() - started)
+        elif self._batch_handler is not None:
+            started = perf_counter()
+            self._batch_handler(batch)
+            if metrics is not None:
+                metrics.duration.record(perf_counter() - started)
+        else:
+            for event in batch:
+                if metrics is None:
+                    event.action(*event.argument, **event.kwargs)
+                else:
+                    started = perf_counter()
+                    event.action(*event.argument, **event.kwargs)
+                    metrics.duration.record(perf_counter() - started)
+        if self._limits:
+            self._release(batch)
+        if any(event.id for event in batch):
+            self._reschedule_completed(batch)
+
+    def _jobs(self, batch) -> list:
+        """Return the calls executing a batch of events, as tuples of the
+        event (or the batch for the batch handler), the function and its
+        arguments.
+        """
+        if self._batch_handler is not None:
+            return [(batch, self._batch_handler, (batch,), {})]
+        return [(event, event.action, event.argument, event.kwargs)
+                for event in batch]
+
+    def _call_traced(self, subject, action, argument, kwargs):
+        """Call an action under the watchdog and, if the call is sampled,
+        between the dispatch hooks. Runs on the thread executing the action.
+        """
+        sampled = self._trace_sample_rate >= 1 or \
+            random() < self._trace_sample_rate
+        if sampled:
+            started = self.timefunc()
+            if self._before_dispatch is not None:
+                self._before_dispatch(subject, started)
+            began = perf_counter()
+        watchdog = self._watchdog
+        if watchdog is not None:
+            token = watchdog.started(subject, threading.get_ident())
+            try:
+                result = action(*argument, **kwargs)
+            finally:
+                watchdog.finished(token)
+        else:
+            result = action(*argument, **kwargs)
+        if sampled and self._after_dispatch is not None:
+            self._after_dispatch(subject, started, perf_counter() - began)
+        return result
+
+    def _submit(self, batch):
+        """Submit the actions of a batch of events, or the batch handler, to
+        the executor.
+        """
+        for subject, action, argument, kwargs in self._jobs(batch):
+            if self._traced:
+                argument = (subject, action, argument, kwargs)
+                action, kwargs = self._call_traced, {}
+            if self._in_flight is not None:
+                self._in_flight.acquire()
+            future = self._executor.submit(action, *argument, **kwargs)
+            future.add_done_callback(partial(self._on_done,
+                                             subject,
+                                             perf_counter()))
+
     def _run(self):
         """ Execute events with the soonest time and lowest priority events
         executing first. If there aren't any events available to run, this
-        thread uses a timer and waits on a condition variable. When the
-        deadline for the event has passed, the timer calls notify() on the
-        condition variable and the event action is executed.
+        thread waits on a condition variable until the deadline of the soonest
+        event. If the scheduler has a timer class, a timer is used instead and
+        calls notify() on the condition variable when the deadline for the
+        event has passed, then the event action is executed.
+
+        When dispatching in batches, all the events which are due are popped
+        at once and executed one after the other, or handed to the batch
+        handler.
+
+        If the scheduler has an executor, due events are popped while holding
+        the lock and their actions are submitted to the executor after the
+        lock is released.
 
         A terminating event is enqueued when the event scheduler is stopped
         and joins the event scheduler thread once the queue is drained.
@@ -328,57 +1622,246 @@ class EventScheduler:
         # and to improve thread safety
         cv = self._cv
         q = self._queue
+        pending = self._pending
         timer = self._timer
         timefunc = self.timefunc
-        pop = heapq.heappop
+        timer_class = self._timer_class
+        peek = q.peek
+        pop = q.pop
+        executor = self._executor
+        take_due = self._take_due
+        fair = self._fair
         while True:
             with cv:
-                if not q or timer:
+                if (not q and not fair) or timer:
                     cv.wait()
                 if timer:
                     timer.cancel()
                     timer = None
-                if not q:
+                # Discard the tombstones of cancelled events
+                while q and id(peek()[3]) not in pending:
+                    pop()
+                if fair:
+                    # Due events are waiting for the turn of their tenant,
+                    # dispatch them right away.
+                    time, priority = float('-inf'), 0
+                elif not q:
                     continue
-                time, priority, action, argument, kwargs, event_id = q[0]
+                else:
+                    time, priority = peek()[:2]
                 if priority == sys.maxsize:
-                    pop(q)
+                    if len(pending) > 1:
+                        # Events deferred by the limits of their key are
+                        # still pending, terminate after them.
+                        self._defer_termination()
+                        continue
+                    self._forget(pop()[3])
                     self._notify()
                     break
                 now = timefunc()
                 if time > now:
+                    # Events with slack may wait for the soonest deadline to
+                    # execute along with the events due by then.
+                    time = self._wakeup_time(time)
+                    if timer_class is None:
+                        # Event is not ready to execute. Wait until it's ready
+                        # or until another thread changes the queue.
+                        cv.wait(time - now)
+                        continue
                     # Event is not ready to execute. Initialize a timer to wake
                     # up this thread when the first event is ready to execute.
-                    timer = self._timer_class(time - now, self._notify)
+                    timer = timer_class(time - now, self._notify)
                     timer.start()
                     self._notify()
                     continue
-                else:
-                    # Take out the event from the queue since it's ready to
-                    # execute
-                    pop(q)
-                if event_id:
-                    self._reschedule_recurring(time, priority, action,
-                                               argument, kwargs, event_id)
-                action(*argument, **kwargs)
+                batch = take_due(now)
+                if not batch:
+                    continue
+                if executor is None:
+                    self._execute(batch)
+                    self._notify()
+                    continue
                 self._notify()
+            # Producers never wait on user code since the actions are
+            # submitted after the lock is released.
+            self._submit(batch)
 
     @property
     def queue(self) -> list:
         """Return an ordered list of upcoming events. Events are named tuples
-        with fields for: time, priority, action, arguments, kwargs, id
+        with fields for: time, priority, action, arguments, kwargs, id, key,
+        max_lateness, slack, tenant, tags
 
         Returns:
             list: All the events currently in the queue ordered from the
             soonest to occur and by priority,
         """
-        # Use heapq to sort the queue rather than using 'sorted(self._queue)'.
-        # With heapq, two events scheduled at the same time will show in
-        # the actual order they would be retrieved.
+        # The sequence numbers of the entries order the events scheduled at
+        # the same time and priority as they would be retrieved.
         with self._lock:
-            events = self._queue[:]
-            self._notify()
-        return list(map(heapq.heappop, [events] * len(events)))
+            entries = self._live_entries()
+        entries.sort()
+        return [entry[3] for entry in entries]
+
+    def _live_entries(self):
+        """Return the entries of the pending events, including the events
+        waiting for an execution of their key to complete. Only executed while
+        holding the queue lock.
+        """
+        pending = self._pending
+        entries = [entry for entry in self._queue if id(entry[3]) in pending]
+        if self._fair is not None:
+            entries.extend(entry for entry in self._fair
+                           if id(entry[3]) in pending)
+        for limit in self._limits.values():
+            entries.extend(entry for entry in limit.parked
+                           if id(entry[3]) in pending)
+        periodic = self._periodic_event
+        if periodic is not None:
+            entries = [entry for entry in entries if entry[3] is not periodic]
+        return entries
+
+    def __len__(self) -> int:
+        """Return the number of pending events in O(1)."""
+        with self._lock:
+            # Not counting the internal event of the periodic jobs
+            return len(self._pending) - (self._periodic_event is not None)
+
+    def peek(self) -> Event:
+        """Return the next event to execute without removing it from the
+        queue. This doesn't wake up the internal thread.
+
+        Returns:
+            Event: The soonest pending event with the lowest priority, None if
+            the queue is empty.
+        """
+        with self._lock:
+            q = self._queue
+            pending = self._pending
+            periodic = self._periodic_event
+            hidden = None
+            while q:
+                entry = q.peek()
+                if id(entry[3]) not in pending:
+                    # Discard the tombstones of cancelled events
+                    q.pop()
+                elif entry[3] is periodic:
+                    # The internal event of the periodic jobs is set aside
+                    # to look at the event after it
+                    hidden = q.pop()
+                else:
+                    break
+            entries = []
+            if q and q.peek()[1] != sys.maxsize:
+                entries.append(q.peek())
+            if hidden is not None:
+                q.push(hidden)
+            if self._fair:
+                # The due events waiting for the turn of their tenant are
+                # sooner than the queue
+                entries.extend(entry for entry in self._fair
+                               if id(entry[3]) in pending and
+                               entry[3] is not periodic)
+            if not entries:
+                return None
+            return min(entries)[3]
+
+    def iter_queue(self):
+        """Return an iterator over the upcoming events, ordered like the
+        queue property. The pending events are copied when this is called but
+        only sorted as the iterator is consumed, so taking the first k events
+        costs O(n + k log n) instead of sorting the whole queue.
+
+        Returns:
+            iterator: The events which were pending when this was called, from
+            the soonest to occur and by priority.
+        """
+        with self._lock:
+            entries = [entry for entry in self._live_entries()
+                       if entry[1] != sys.maxsize]
+        heapq.heapify(entries)
+        return self._drain(entries)
+
+    @staticmethod
+    def _drain(entries):
+        while entries:
+            yield heapq.heappop(entries)[3]
+
+    def events_for_action(self, action) -> list:
+        """Return the pending events of an action. With index_actions set,
+        this only looks at the events of the action, otherwise the pending
+        events are scanned.
+
+        Args:
+            action (callable): The action of the events.
+
+        Returns:
+            list: The pending events of the action ordered from the soonest to
+            occur and by priority.
+        """
+        with self._lock:
+            if self._by_action is not None:
+                events = list(self._by_action.get(action, {}).values())
+            else:
+                events = [event for event in self._pending.values()
+                          if event.action == action]
+        # The sort is stable and the events are in the order they were
+        # entered, so events with the same time and priority keep it.
+        events.sort()
+        return events
+
+    def events_for_tag(self, tag) -> list:
+        """Return the pending events entered with a tag, only looking at the
+        events of the tag.
+
+        Args:
+            tag (hashable): The tag of the events.
+
+        Returns:
+            list: The pending events of the tag ordered from the soonest to
+            occur and by priority.
+        """
+        with self._lock:
+            events = list(self._by_tag.get(tag, {}).values())
+        # The events are in the order they were entered, so the stable sort
+        # keeps it for events with the same time and priority.
+        events.sort()
+        return events
+
+    def skipped_ticks(self, event_id) -> int:
+        """Return the number of occurrences of a recurring event which were
+        skipped because of its COALESCE catch-up policy.
+
+        Args:
+            event_id (int): The id of the recurring event.
+
+        Returns:
+            int: The number of skipped occurrences, 0 if the recurring event
+            isn't scheduled.
+        """
+        with self._lock:
+            return self._skipped_ticks.get(event_id, 0)
+
+    def stats(self) -> dict:
+        """Return a snapshot of the scheduler's metrics. This doesn't wake up
+        the internal thread.
+
+        Returns:
+            dict: The number of pending events ('queue_depth') and recurring
+            events ('recurring_events'). If metrics are enabled, also the
+            number of events 'entered', 'cancelled', 'executed' and 'shed', the
+            number of occurrences of recurring events 'skipped_ticks', and
+            summaries of the dispatch 'lag' (actual start time minus scheduled
+            time) and of the action 'duration' in seconds. For actions run on
+            an executor, the duration includes the time spent waiting for a
+            worker.
+        """
+        with self._lock:
+            stats = {'queue_depth': len(self),
+                     'recurring_events': len(self._recurring_events)}
+            if self._metrics is not None:
+                stats.update(self._metrics.snapshot())
+        return stats
 
     def start(self) -> int:
         """Start the event scheduler and enable it to start taking events.
@@ -387,14 +1870,62 @@ class EventScheduler:
             int: 0 if the event scheduler was successfully started, -1 if the
             scheduler has already been started or is in the process of
             stopping.
+
+        Raises:
+            ValueError: If the action of an event of the journal isn't in its
+                registry. The scheduler isn't started.
         """
         with self._lock:
             if self._scheduler_status != SchedulerStatus.STOPPED:
                 return -1
+            # The journal is loaded first so the scheduler stays stopped if
+            # it can't be restored.
+            journal = self._journal_config
+            if journal is not None:
+                restored = journal.open(self.timefunc)
             self._event_thread.start()
+            if self._watchdog is not None:
+                self._watchdog.start()
             self._scheduler_status = SchedulerStatus.RUNNING
+            if journal is not None:
+                self._restore(journal, restored)
         return 0
 
+    def _restore(self, journal, restored):
+        """Enter the pending events of the opened journal and start
+        journaling. Only executed while holding the queue lock.
+        """
+        for record_id, time, priority, action, arguments, kwargs, interval, \
+                catch_up, options in restored:
+            event_id = 0
+            if interval is not None:
+                self._id_counter += 1
+                event_id = self._id_counter
+            event = Event(time,
+                          priority,
+                          action,
+                          arguments,
+                          kwargs,
+                          event_id,
+                          **options)
+            if event_id:
+                self._recurring_events[event_id] = (event,
+                                                    interval,
+                                                    CatchUpPolicy(catch_up))
+            self._push(event)
+            journal.restored(event, record_id)
+        self._journal = journal
+        if restored:
+            self._notify()
+
+    def _close_journal(self):
+        """Commit the journal and stop journaling. Pending events stay in
+        the journal.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
     def stop(self, hard_stop: bool = False) -> int:
         """Stop the event scheduler and stop its internal thread. Will not be
         able to take in new events when invoked.
@@ -403,7 +1934,7 @@ class EventScheduler:
             hard_stop (bool, optional): If set to `False`, wait until all
                 events execute at their scheduled time before stopping. If set
                 to `True`, will stop the scheduler right away and discard all
-                pending events.
+                pending events. The periodic jobs are removed either way.
         Returns:
             int: 0 if the event scheduler was successfully stopped, -1 if the
             scheduler is already in the process of stopping/already stopped.
@@ -412,11 +1943,15 @@ class EventScheduler:
             if self._scheduler_status != SchedulerStatus.RUNNING:
                 return -1
             if hard_stop:
+                # The pending events stay in the journal, to be restored the
+                # next time a scheduler starts with it.
+                self._close_journal()
                 self.cancel_all()
+            self._stop_periodic()
             self._scheduler_status = SchedulerStatus.STOPPING
             last_event = Event(self.timefunc(), 0, None, (), {}, 0)
-            if self._queue:
-                last_event = max(self._queue)
+            if self._pending:
+                last_event = max(self._pending.values())
             # we want to make sure the "terminating" event is the last one in
             # the queue
             event = Event(last_event.time,
@@ -425,10 +1960,15 @@ class EventScheduler:
                           (),
                           {},
                           0)
-            heapq.heappush(self._queue, event)
+            self._push(event)
             self._notify()
         sleep(0)  # let other threads run since the next line is a join
         self._event_thread.join()
+        self._close_journal()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+        if self._watchdog is not None:
+            self._watchdog.stop()
         with self._lock:
             self._scheduler_status = SchedulerStatus.STOPPED
         return 0
@@ -0,0 +1,95 @@
+from collections import deque
+
+
+class DeficitRoundRobin:
+    """Shares the dispatch of due events between tenants by weight with
+    deficit round-robin. Every tenant with due events has a FIFO of queue
+    entries and the tenants take turns: a tenant is credited its weight when
+    its turn comes, and dispatches one event per credit. A tenant flooding
+    the scheduler then only delays the others by its weight rather than by
+    its backlog. Updated while holding the scheduler's lock.
+    """
+    def __init__(self, weights=None):
+        """
+        Args:
+            weights (dict, optional): The weights of the tenants (key: tenant,
+                value: weight). Tenants without a weight have a weight of 1.
+
+        Raises:
+            ValueError: If a weight isn't greater than 0.
+        """
+        self.weights = {}
+        for tenant, weight in (weights or {}).items():
+            self.set_weight(tenant, weight)
+        # Due entries of the tenants with a backlog (key: tenant, value:
+        # deque of queue entries)
+        self._flows = {}
+        # Tenants with a backlog in round-robin order, the first one has the
+        # turn
+        self._active = deque()
+        # Credits of the tenants with a backlog (key: tenant, value: credit)
+        self._deficits = {}
+        self._size = 0
+
+    def set_weight(self, tenant, weight):
+        """Set the weight of a tenant, from its next turn.
+
+        Raises:
+            ValueError: If weight isn't greater than 0.
+        """
+        if weight <= 0:
+            raise ValueError('The weight of a tenant must be greater than 0')
+        self.weights[tenant] = weight
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        for flow in self._flows.values():
+            yield from flow
+
+    def push(self, entry):
+        """Add the queue entry of a due event to the FIFO of its tenant."""
+        tenant = entry[3].tenant
+        flow = self._flows.get(tenant)
+        if flow is None:
+            flow = self._flows[tenant] = deque()
+            # A tenant which has the turn right away gets its credit now,
+            # the others get it when their turn comes.
+            self._deficits[tenant] = \
+                0 if self._active else self.weights.get(tenant, 1)
+            self._active.append(tenant)
+        flow.append(entry)
+        self._size += 1
+
+    def pop(self):
+        """Remove and return the next entry to dispatch. The queue must not be
+        empty.
+        """
+        active = self._active
+        deficits = self._deficits
+        while True:
+            tenant = active[0]
+            if deficits[tenant] >= 1:
+                break
+            # The tenant used up its credit, the next one gets its turn
+            active.rotate(-1)
+            deficits[active[0]] += self.weights.get(active[0], 1)
+        deficits[tenant] -= 1
+        flow = self._flows[tenant]
+        entry = flow.popleft()
+        self._size -= 1
+        if not flow:
+            # Idle tenants don't keep their credit
+            del self._flows[tenant]
+            del deficits[tenant]
+            active.popleft()
+            if active:
+                deficits[active[0]] += self.weights.get(active[0], 1)
+        return entry
+
+    def clear(self):
+        self._flows.clear()
+        self._active.clear()
+        self._deficits.clear()
+        self._size = 0
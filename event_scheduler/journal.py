@@ -0,0 +1,296 @@
+import json
+import math
+import os
+import threading
+from time import time as wall_time
+
+
+class Journal:
+    """The Journal makes the events of an event scheduler durable. Entered and
+    cancelled events are appended to a log file and a compact snapshot of the
+    pending events is written periodically. When the scheduler starts, the
+    pending events of the journal are restored.
+
+    Only events whose action is in the journal's registry of actions are
+    persisted, the registry maps the names stored in the journal to the
+    callables. The arguments of those events must be serializable to JSON.
+
+    Records are written by a background thread which commits them in groups
+    every `commit_interval` seconds, so entering an event never waits on the
+    disk. Events entered within the last `commit_interval` seconds can be lost
+    on a crash.
+
+    Event times are stored as wall-clock times since the scheduler's timefunc
+    doesn't survive restarts. Events which became due while the scheduler was
+    down execute right away. Recurring events restart at their next
+    occurrence, missed occurrences are skipped.
+    """
+    def __init__(self,
+                 path,
+                 actions,
+                 commit_interval=0.01,
+                 snapshot_every=10000):
+        """
+        Args:
+            path (str): The path of the log file. The snapshot is written
+                next to it, with a '.snapshot' suffix.
+            actions (dict): The registry of actions, mapping names to
+                callables.
+            commit_interval (float, optional): The maximum time in seconds
+                between two group commits of the log.
+            snapshot_every (int, optional): The number of log records after
+                which a snapshot is written and the log is truncated.
+        """
+        self._path = path
+        self._snapshot_path = path + '.snapshot'
+        self._actions = dict(actions)
+        self._names = {action: name for name, action in actions.items()}
+        self._commit_interval = commit_interval
+        self._snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Records of the pending events (key: record id, value: record)
+        self._live = {}
+        # Record ids of the pending events (key: id(event) for one-shot
+        # events, recurring event id for recurring events)
+        self._record_ids = {}
+        self._recurring_record_ids = {}
+        self._buffer = []
+        self._seq = 0
+        self._next_id = 1
+        self._records_since_snapshot = 0
+        self._timefunc = None
+        self._closed = threading.Event()
+        self._wakeup = threading.Event()
+        self._writer = None
+
+    def _load(self):
+        """Load the snapshot and replay the log written after it."""
+        snapshot_seq = 0
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            snapshot_seq = self._seq = snapshot['seq']
+            self._next_id = snapshot['next_id']
+            self._live = {record['id']: record
+                          for record in snapshot['records']}
+        if not os.path.exists(self._path):
+            return
+        committed = 0
+        with open(self._path, 'rb') as log:
+            for line in log:
+                try:
+                    record = json.loads(line.decode())
+                except ValueError:
+                    # A partially written record, the rest of the log was
+                    # never committed. Truncate it so new records follow the
+                    # last committed one.
+                    log.close()
+                    os.truncate(self._path, committed)
+                    break
+                committed += len(line)
+                if record['seq'] <= snapshot_seq:
+                    continue
+                self._seq = record['seq']
+                if record['op'] == 'enter':
+                    self._live[record['id']] = record
+                    self._next_id = max(self._next_id, record['id'] + 1)
+                elif record['op'] == 'remove':
+                    self._live.pop(record['id'], None)
+                elif record['op'] == 'clear':
+                    self._live.clear()
+                self._records_since_snapshot += 1
+
+    def open(self, timefunc) -> list:
+        """Load the journal and start committing records. Called by the event
+        scheduler when it starts.
+
+        Args:
+            timefunc: The timing function of the event scheduler.
+
+        Returns:
+            list: Tuples of (record id, time, priority, action, arguments,
+            kwargs, interval, catch_up, options) of the pending events, with
+            their time converted to the scheduler's timefunc. The interval and
+            catch_up policy are None for one-shot events. The options are a
+            dictionary of the optional fields of the event.
+
+        Raises:
+            ValueError: If the action of a pending event isn't in the
+                registry.
+        """
+        self._timefunc = timefunc
+        self._load()
+        now = wall_time()
+        offset = timefunc() - now
+        restored = []
+        for record in self._live.values():
+            if record['action'] not in self._actions:
+                raise ValueError('Action {!r} of a journaled event is not in '
+                                 'the registry'.format(record['action']))
+            wall = record['wall']
+            interval = record['interval']
+            if interval is not None and wall < now:
+                wall += math.ceil((now - wall) / interval) * interval
+            restored.append((record['id'],
+                             wall + offset,
+                             record['priority'],
+                             self._actions[record['action']],
+                             tuple(record['arguments']),
+                             record['kwargs'],
+                             interval,
+                             record.get('catch_up'),
+                             self._options(record)))
+        self._closed.clear()
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name='event_scheduler_journal',
+                                        daemon=True)
+        self._writer.start()
+        return restored
+
+    def encode(self, event, interval=None, catch_up=None):
+        """Serialize an event before it's entered. Recurring events are
+        given their interval and the value of their catch-up policy.
+
+        Returns:
+            dict: The record of the event, None if its action isn't in the
+            registry.
+
+        Raises:
+            ValueError: If the arguments, the key or the tags of the event
+                can't be serialized.
+        """
+        name = self._names.get(event.action)
+        if name is None or self._timefunc is None:
+            return None
+        record = {'op': 'enter',
+                  'wall': wall_time() + event.time - self._timefunc(),
+                  'priority': event.priority,
+                  'action': name,
+                  'arguments': list(event.argument),
+                  'kwargs': dict(event.kwargs),
+                  'interval': interval,
+                  'catch_up': catch_up,
+                  'options': {'key': event.key,
+                              'max_lateness': event.max_lateness,
+                              'slack': event.slack,
+                              'tenant': event.tenant,
+                              'tags': list(event.tags or ())}}
+        try:
+            json.dumps(record)
+        except TypeError as exc:
+            raise ValueError('The arguments, the key and the tags of a '
+                             'journaled event must be serializable to '
+                             'JSON') from exc
+        return record
+
+    @staticmethod
+    def _options(record):
+        options = dict(record.get('options', {}))
+        # The tags are stored as a list
+        if options.get('tags'):
+            options['tags'] = frozenset(options['tags'])
+        else:
+            options.pop('tags', None)
+        return options
+
+    def _append(self, record):
+        self._seq += 1
+        record['seq'] = self._seq
+        self._buffer.append(json.dumps(record))
+        self._records_since_snapshot += 1
+
+    def entered(self, event, record):
+        """Log an entered event using the record returned by encode()."""
+        with self._lock:
+            record_id = self._next_id
+            self._next_id += 1
+            record['id'] = record_id
+            self._live[record_id] = record
+            self._append(dict(record))
+            if record['interval'] is None:
+                self._record_ids[id(event)] = record_id
+            else:
+                self._recurring_record_ids[event.id] = record_id
+
+    def restored(self, event, record_id):
+        """Bind an event restored by the scheduler to its existing record."""
+        with self._lock:
+            if event.id:
+                self._recurring_record_ids[event.id] = record_id
+            else:
+                self._record_ids[id(event)] = record_id
+
+    def removed(self, event):
+        """Log that a one-shot event was cancelled or executed."""
+        self._remove(self._record_ids, id(event))
+
+    def removed_recurring(self, event_id):
+        """Log that a recurring event was cancelled."""
+        self._remove(self._recurring_record_ids, event_id)
+
+    def _remove(self, record_ids, key):
+        with self._lock:
+            record_id = record_ids.pop(key, None)
+            if record_id is None:
+                return
+            del self._live[record_id]
+            self._append({'op': 'remove', 'id': record_id})
+
+    def cleared(self):
+        """Log that all the events were cancelled."""
+        with self._lock:
+            self._record_ids.clear()
+            self._recurring_record_ids.clear()
+            self._live.clear()
+            self._append({'op': 'clear'})
+
+    def flush(self):
+        """Commit the buffered records to disk, and write a snapshot if
+        enough records were logged since the last one.
+        """
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            buffer = self._buffer
+            self._buffer = []
+            snapshot = None
+            if self._records_since_snapshot >= self._snapshot_every:
+                snapshot = {'seq': self._seq,
+                            'next_id': self._next_id,
+                            'records': list(self._live.values())}
+                self._records_since_snapshot = 0
+        if buffer:
+            with open(self._path, 'a') as log:
+                log.write('\n'.join(buffer) + '\n')
+                log.flush()
+                os.fsync(log.fileno())
+        if snapshot is not None:
+            temporary_path = self._snapshot_path + '.tmp'
+            with open(temporary_path, 'w') as snapshot_file:
+                json.dump(snapshot, snapshot_file)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.replace(temporary_path, self._snapshot_path)
+            # Records after the snapshot are still buffered, so the log can
+            # be truncated.
+            open(self._path, 'w').close()
+
+    def _write_loop(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self._commit_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Commit the buffered records and stop the background thread. Called
+        by the event scheduler when it stops.
+        """
+        self._closed.set()
+        self._wakeup.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
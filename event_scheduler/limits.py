@@ -0,0 +1,67 @@
+from collections import deque
+
+
+class KeyLimit:
+    """Limits on the executions of the events entered with the same key: a
+    maximum number of concurrent executions and a token bucket bounding the
+    number of executions per second. Updated while holding the scheduler's
+    lock.
+    """
+    def __init__(self, max_concurrent=None, rate=None, burst=1):
+        """
+        Args:
+            max_concurrent (int, optional): The maximum number of actions of
+                the key executing at the same time.
+            rate (float, optional): The number of executions per second the
+                bucket is refilled with.
+            burst (int, optional): The capacity of the bucket, the number of
+                executions allowed at once after the key was idle.
+
+        Raises:
+            ValueError: If max_concurrent, rate or burst isn't positive.
+        """
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        if rate is not None and rate <= 0:
+            raise ValueError('rate must be greater than 0')
+        if burst < 1:
+            raise ValueError('burst must be at least 1')
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = None
+        # Number of actions of the key which haven't completed yet
+        self.running = 0
+        # Queue entries of the due events waiting for an execution of the key
+        # to complete
+        self.parked = deque()
+
+    def saturated(self) -> bool:
+        """Return True if the maximum number of concurrent executions is
+        reached.
+        """
+        return self.max_concurrent is not None and \
+            self.running >= self.max_concurrent
+
+    def delay(self, now) -> float:
+        """Return the time until the bucket holds a token, 0 if it holds one
+        at `now`.
+        """
+        if self.rate is None:
+            return 0
+        if self._updated is not None:
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(self.burst, self._tokens + refill)
+        self._updated = now
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Take a token and a concurrent execution slot. Only valid right
+        after delay() returned 0.
+        """
+        if self.rate is not None:
+            self._tokens -= 1
+        self.running += 1
@@ -0,0 +1,94 @@
+from math import frexp, ldexp
+
+
+class Histogram:
+    """Log-linear histogram of non-negative values. Every power of two is split
+    in `precision` buckets, so recording a value is a dictionary update and
+    percentiles are accurate to within 1 / `precision` of the value.
+    """
+    def __init__(self, precision=16):
+        """
+        Args:
+            precision (int, optional): The number of buckets per power of two.
+        """
+        self._precision = precision
+        self._buckets = {}
+        self._zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """Add a value to the histogram. Negative values are recorded as 0."""
+        self.count += 1
+        if value <= 0:
+            value = 0
+            self._zeros += 1
+        else:
+            self.total += value
+            mantissa, exponent = frexp(value)
+            key = exponent * self._precision + \
+                int((mantissa - 0.5) * 2 * self._precision)
+            self._buckets[key] = self._buckets.get(key, 0) + 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """Return the value below which `percent` percent of the recorded
+        values fall, None if the histogram is empty.
+        """
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = self._zeros
+        if seen >= rank:
+            return 0
+        precision = self._precision
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen >= rank:
+                exponent, index = divmod(key, precision)
+                upper = ldexp(0.5 + (index + 1) / (2 * precision), exponent)
+                return min(upper, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        """Return a summary of the recorded values."""
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99)}
+
+
+class SchedulerMetrics:
+    """Counters and histograms maintained by an event scheduler with metrics
+    enabled. Updated while holding the scheduler's lock.
+    """
+    def __init__(self):
+        self.entered = 0
+        self.cancelled = 0
+        self.executed = 0
+        # Due events dropped because they were later than their max lateness
+        self.shed = 0
+        # Occurrences of recurring events skipped to catch up
+        self.skipped_ticks = 0
+        # Actual start time minus scheduled time of the events
+        self.lag = Histogram()
+        # Duration of the actions in seconds
+        self.duration = Histogram()
+
+    def snapshot(self) -> dict:
+        """Return a summary of the metrics."""
+        return {'entered': self.entered,
+                'cancelled': self.cancelled,
+                'executed': self.executed,
+                'shed': self.shed,
+                'skipped_ticks': self.skipped_ticks,
+                'lag': self.lag.snapshot(),
+                'duration': self.duration.snapshot()}
@@ -0,0 +1,198 @@
+from array import array
+
+# Job ids are the slot of the job in its low bits and the generation of the
+# slot above them.
+_SLOT_BITS = 32
+_SLOT_MASK = (1 << _SLOT_BITS) - 1
+
+
+class PeriodicJobTable:
+    """A compact table of periodic jobs, for schedulers running a very large
+    number of them (e.g. a heartbeat per device). The jobs are stored as
+    arrays of their next time, interval, priority and action index, and a
+    binary heap of their slots ordered by time and priority, so a job takes
+    about 50 bytes and firing one reschedules it in place without allocating
+    an event. Updated while holding the scheduler's lock.
+
+    The slot of a removed job is reused by the next job added. Job ids
+    combine the slot with its generation, which is incremented when the job
+    is removed, so the id of a removed job doesn't remove the next job of the
+    slot.
+    """
+    def __init__(self):
+        self.times = array('d')
+        self.intervals = array('d')
+        self.priorities = array('q')
+        # Index of the action of every job in self.actions, jobs sharing an
+        # action share the slot.
+        self.action_indexes = array('i')
+        self.actions = []
+        self._action_slots = {}
+        # Arguments of the jobs, () is shared by the jobs without arguments
+        self.arguments = []
+        # Generation of every slot, kept when the table is cleared so the ids
+        # of the removed jobs stay stale.
+        self.generations = array('I')
+        # Binary heap of the slots, and the position of every slot in it (-1
+        # for a free slot)
+        self._heap = array('i')
+        self._positions = array('i')
+        self._free = array('i')
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add(self, time, interval, priority, action, arguments=()) -> int:
+        """Add a job first due at `time`.
+
+        Returns:
+            int: The id of the job.
+        """
+        action_index = self._action_slots.get(action)
+        if action_index is None:
+            action_index = self._action_slots[action] = len(self.actions)
+            self.actions.append(action)
+        arguments = tuple(arguments)
+        if self._free:
+            job = self._free.pop()
+            self.times[job] = time
+            self.intervals[job] = interval
+            self.priorities[job] = priority
+            self.action_indexes[job] = action_index
+            self.arguments[job] = arguments
+        else:
+            job = len(self.times)
+            self.times.append(time)
+            self.intervals.append(interval)
+            self.priorities.append(priority)
+            self.action_indexes.append(action_index)
+            self.arguments.append(arguments)
+            self._positions.append(-1)
+            if job == len(self.generations):
+                self.generations.append(0)
+        self._heap.append(job)
+        self._positions[job] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+        return self.job_id(job)
+
+    def remove(self, job_id) -> bool:
+        """Remove a job in O(log n).
+
+        Returns:
+            bool: True if the job was in the table, False otherwise.
+        """
+        job = job_id & _SLOT_MASK
+        if not 0 <= job < len(self._positions) or \
+                self._positions[job] < 0 or \
+                self.generations[job] != job_id >> _SLOT_BITS:
+            return False
+        heap = self._heap
+        position = self._positions[job]
+        last = heap.pop()
+        self._positions[job] = -1
+        self.arguments[job] = ()
+        self.generations[job] = (self.generations[job] + 1) & _SLOT_MASK
+        self._free.append(job)
+        if last != job:
+            heap[position] = last
+            self._positions[last] = position
+            self._sift_down(position)
+            self._sift_up(self._positions[last])
+        return True
+
+    def peek(self) -> int:
+        """Return the slot of the soonest job, -1 if the table is empty."""
+        return self._heap[0] if self._heap else -1
+
+    def pop_due(self, now) -> int:
+        """Reschedule the soonest job to its next time if it's due at `now`.
+        A job which fell behind is due again right away until it caught up.
+
+        Returns:
+            int: The slot of the job, -1 if no job is due.
+        """
+        if not self._heap:
+            return -1
+        job = self._heap[0]
+        if self.times[job] > now:
+            return -1
+        self.times[job] += self.intervals[job]
+        self._sift_down(0)
+        return job
+
+    def job_id(self, job) -> int:
+        """Return the id of the job in a slot."""
+        return job | self.generations[job] << _SLOT_BITS
+
+    def clear(self):
+        """Remove all the jobs."""
+        self.times = array('d')
+        self.intervals = array('d')
+        self.priorities = array('q')
+        self.action_indexes = array('i')
+        self.actions = []
+        self._action_slots = {}
+        self.arguments = []
+        self.generations = array('I', [(generation + 1) & _SLOT_MASK
+                                       for generation in self.generations])
+        self._heap = array('i')
+        self._positions = array('i')
+        self._free = array('i')
+
+    def _sift_up(self, position):
+        heap = self._heap
+        positions = self._positions
+        times = self.times
+        priorities = self.priorities
+        job = heap[position]
+        time = times[job]
+        priority = priorities[job]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent = heap[parent_position]
+            # Jobs are ordered by time, priority and slot
+            parent_time = times[parent]
+            if parent_time < time or parent_time == time and (
+                    priorities[parent] < priority or
+                    priorities[parent] == priority and parent < job):
+                break
+            heap[position] = parent
+            positions[parent] = position
+            position = parent_position
+        heap[position] = job
+        positions[job] = position
+
+    def _sift_down(self, position):
+        heap = self._heap
+        positions = self._positions
+        times = self.times
+        priorities = self.priorities
+        size = len(heap)
+        job = heap[position]
+        time = times[job]
+        priority = priorities[job]
+        while True:
+            child_position = 2 * position + 1
+            if child_position >= size:
+                break
+            child = heap[child_position]
+            child_time = times[child]
+            if child_position + 1 < size:
+                right = heap[child_position + 1]
+                right_time = times[right]
+                if right_time < child_time or right_time == child_time and (
+                        priorities[right] < priorities[child] or
+                        priorities[right] == priorities[child] and
+                        right < child):
+                    child_position += 1
+                    child = right
+                    child_time = right_time
+            if time < child_time or time == child_time and (
+                    priority < priorities[child] or
+                    priority == priorities[child] and job < child):
+                break
+            heap[position] = child
+            positions[child] = position
+            position = child_position
+        heap[position] = job
+        positions[job] = position
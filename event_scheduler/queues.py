@@ -0,0 +1,232 @@
+import heapq
+
+# Queue backends for the EventScheduler. A queue holds the entries of the
+# scheduled events, tuples of (time, priority, sequence number, event), and
+# hands them back in order. Cancelled events are tracked by the scheduler
+# itself, so the queues never have to search for an event.
+#
+# The entries make heap operations cheaper and keep events with the same
+# time and priority in order, at the cost of memory: an entry and its
+# sequence number take about 100 bytes on top of the Event handle returned to
+# the caller, which can't be the entry itself since its fields don't compare
+# natively.
+
+
+class HeapQueue:
+    """Binary heap of event entries. Insertion and removal of the next entry
+    are O(log n). This is the default queue of the event scheduler.
+    """
+    def __init__(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        """Iterate over the queued entries in no particular order."""
+        return iter(self._heap)
+
+    def push(self, entry):
+        """Add an entry to the queue."""
+        heapq.heappush(self._heap, entry)
+
+    def push_many(self, entries):
+        """Add a list of entries to the queue. The heap is rebuilt in one pass
+        if the batch is larger than the queue.
+        """
+        heap = self._heap
+        if len(entries) > len(heap):
+            heap.extend(entries)
+            heapq.heapify(heap)
+        else:
+            for entry in entries:
+                heapq.heappush(heap, entry)
+
+    def peek(self):
+        """Return the next entry without removing it, None if the queue is
+        empty.
+        """
+        return self._heap[0] if self._heap else None
+
+    def pop(self):
+        """Remove and return the next entry.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        return heapq.heappop(self._heap)
+
+    def clear(self):
+        """Remove all the entries from the queue."""
+        self._heap.clear()
+
+    def compact(self, keep):
+        """Only retain the entries for which keep(entry) is True."""
+        self._heap[:] = [entry for entry in self._heap if keep(entry)]
+        heapq.heapify(self._heap)
+
+
+class TimingWheelQueue:
+    """Hierarchical timing wheel of event entries. Time is divided in ticks of
+    `resolution` and entries are bucketed by tick, so insertion is O(1) no
+    matter how many entries are queued. The entries of the current tick are
+    kept in a small heap so they're still ordered by time and priority.
+
+    Each level of the wheel has 2 ** `slot_bits` slots and every slot of a
+    level spans a whole rotation of the level below. Entries too far ahead
+    for the top level wait in an overflow heap until the wheel catches up.
+    With the defaults, the wheel spans about 49 days at a millisecond
+    resolution.
+
+    To use it, pass the class (or a functools.partial of it to change the
+    defaults) as the `queue_class` of the EventScheduler.
+    """
+    def __init__(self, resolution=0.001, slot_bits=8, levels=4):
+        """
+        Args:
+            resolution (float, optional): The length of a tick in the unit of
+                the scheduler's timefunc.
+            slot_bits (int, optional): Each level of the wheel has
+                2 ** slot_bits slots.
+            levels (int, optional): The number of levels of the wheel.
+
+        Raises:
+            ValueError: If the resolution isn't positive, or if slot_bits or
+                levels are lower than 1.
+        """
+        if resolution <= 0:
+            raise ValueError('Resolution must be greater than 0')
+        if slot_bits < 1 or levels < 1:
+            raise ValueError('slot_bits and levels must be at least 1')
+        self._resolution = resolution
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._levels = levels
+        self._wheels = [[[] for _ in range(1 << slot_bits)]
+                        for _ in range(levels)]
+        # Entries with a tick at or before the current tick, ordered as a heap
+        self._due = []
+        # Entries beyond the top level of the wheel, ordered as a heap
+        self._overflow = []
+        self._current = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        """Iterate over the queued entries in no particular order."""
+        yield from self._due
+        for wheel in self._wheels:
+            for slot in wheel:
+                yield from slot
+        yield from self._overflow
+
+    def _tick(self, entry):
+        return int(entry[0] // self._resolution)
+
+    def _place(self, entry, tick):
+        current = self._current
+        if tick <= current:
+            heapq.heappush(self._due, entry)
+            return
+        bits = self._bits
+        for level in range(self._levels):
+            shift = bits * (level + 1)
+            if tick >> shift == current >> shift:
+                slot = (tick >> (bits * level)) & self._mask
+                self._wheels[level][slot].append(entry)
+                return
+        heapq.heappush(self._overflow, entry)
+
+    def _advance(self):
+        """Move the current tick forward to the next non-empty slot until
+        there's an entry due. Only called when there are queued entries.
+        """
+        bits = self._bits
+        mask = self._mask
+        while not self._due:
+            for level in range(self._levels):
+                shift = bits * level
+                wheel = self._wheels[level]
+                start = ((self._current >> shift) & mask) + 1
+                slot = next((s for s in range(start, mask + 1) if wheel[s]),
+                            None)
+                if slot is None:
+                    continue
+                block_shift = shift + bits
+                self._current = ((self._current >> block_shift)
+                                 << block_shift) | (slot << shift)
+                entries = wheel[slot]
+                wheel[slot] = []
+                # Cascade the slot's entries down to the lower levels
+                for entry in entries:
+                    self._place(entry, self._tick(entry))
+                break
+            else:
+                # The wheel is empty, catch up with the overflow.
+                overflow = self._overflow
+                self._current = self._tick(overflow[0])
+                top_shift = bits * self._levels
+                top = self._current >> top_shift
+                while overflow and self._tick(overflow[0]) >> top_shift == top:
+                    entry = heapq.heappop(overflow)
+                    self._place(entry, self._tick(entry))
+
+    def push(self, entry):
+        """Add an entry to the queue."""
+        tick = self._tick(entry)
+        if not self._size:
+            self._current = tick
+        self._place(entry, tick)
+        self._size += 1
+
+    def push_many(self, entries):
+        """Add a list of entries to the queue."""
+        for entry in entries:
+            self.push(entry)
+
+    def peek(self):
+        """Return the next entry without removing it, None if the queue is
+        empty.
+        """
+        if not self._size:
+            return None
+        if not self._due:
+            self._advance()
+        return self._due[0]
+
+    def pop(self):
+        """Remove and return the next entry.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        if not self._size:
+            raise IndexError('pop from an empty queue')
+        if not self._due:
+            self._advance()
+        self._size -= 1
+        return heapq.heappop(self._due)
+
+    def clear(self):
+        """Remove all the entries from the queue."""
+        self._due.clear()
+        self._overflow.clear()
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot.clear()
+        self._size = 0
+
+    def compact(self, keep):
+        """Only retain the entries for which keep(entry) is True."""
+        self._due[:] = [entry for entry in self._due if keep(entry)]
+        heapq.heapify(self._due)
+        self._overflow[:] = [entry for entry in self._overflow if keep(entry)]
+        heapq.heapify(self._overflow)
+        size = len(self._due) + len(self._overflow)
+        for wheel in self._wheels:
+            for slot in wheel:
+                slot[:] = [entry for entry in slot if keep(entry)]
+                size += len(slot)
+        self._size = size
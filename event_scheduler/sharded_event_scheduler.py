@@ -0,0 +1,451 @@
+import heapq
+import itertools
+
+from event_scheduler.event_scheduler import CatchUpPolicy, Event, \
+    EventScheduler, KeyedMode, _sentinel
+
+
+class ShardedEventScheduler:
+    """
+    The Sharded Event Scheduler partitions events across several event
+    schedulers, each with its own queue, lock and internal thread, so
+    producers don't all contend on one lock and events are dispatched from
+    several threads at once.
+
+    Events entered with the same key always go to the same shard, so they
+    execute in order of time and priority relative to each other. Events
+    entered without a key are spread across the shards round-robin and
+    don't have ordering guarantees relative to events of other shards.
+    """
+    def __init__(self, shards, thread_name=None, **kwargs):
+        """
+        Args:
+            shards (int): The number of shards.
+            thread_name (str, optional): provide a string name prefix for the
+            internal threads, the shard index is appended to it.
+            **kwargs: Arguments used to create the event scheduler of every
+            shard, see :obj:`EventScheduler`.
+
+        Raises:
+            ValueError: If shards is lower than 1.
+        """
+        if shards < 1:
+            raise ValueError('There must be at least one shard')
+        self._schedulers = [
+            EventScheduler(thread_name and '{}-{}'.format(thread_name, index),
+                           **kwargs)
+            for index in range(shards)]
+        self._round_robin = itertools.count()
+
+    @property
+    def shards(self) -> list:
+        """Return the event schedulers of the shards."""
+        return list(self._schedulers)
+
+    def _shard(self, key):
+        if key is None:
+            index = next(self._round_robin)
+        else:
+            index = hash(key)
+        return index % len(self._schedulers)
+
+    def enterabs(self,
+                 time,
+                 priority,
+                 action,
+                 arguments=(),
+                 kwargs=_sentinel,
+                 key=None,
+                 max_lateness=None,
+                 slack=None,
+                 tenant=None,
+                 tags=None) -> Event:
+        """Enter a new event in the queue of a shard to occur at an absolute
+        time. See :obj:`EventScheduler.enterabs`.
+
+        Args:
+            key (hashable, optional): Events with the same key are entered in
+                the same shard, where the limits of the key apply to them.
+                Round-robin if not set.
+        """
+        return self._schedulers[self._shard(key)].enterabs(time,
+                                                           priority,
+                                                           action,
+                                                           arguments,
+                                                           kwargs,
+                                                           key,
+                                                           max_lateness,
+                                                           slack,
+                                                           tenant,
+                                                           tags)
+
+    def enter(self,
+              delay,
+              priority,
+              action,
+              arguments=(),
+              kwargs=_sentinel,
+              key=None,
+              max_lateness=None,
+              slack=None,
+              tenant=None,
+              tags=None) -> Event:
+        """Enter a new event in the queue of a shard to occur at a time
+        relative to the current time. See :obj:`EventScheduler.enter`.
+
+        Args:
+            key (hashable, optional): Events with the same key are entered in
+                the same shard, where the limits of the key apply to them.
+                Round-robin if not set.
+        """
+        return self._schedulers[self._shard(key)].enter(delay,
+                                                        priority,
+                                                        action,
+                                                        arguments,
+                                                        kwargs,
+                                                        key,
+                                                        max_lateness,
+                                                        slack,
+                                                        tenant,
+                                                        tags)
+
+    def enterabs_keyed(self,
+                       key,
+                       time,
+                       priority,
+                       action,
+                       arguments=(),
+                       kwargs=_sentinel,
+                       mode=KeyedMode.DEBOUNCE,
+                       max_lateness=None,
+                       slack=None,
+                       tenant=None,
+                       tags=None) -> Event:
+        """Enter a new keyed event in the queue of the shard of its key. See
+        :obj:`EventScheduler.enterabs_keyed`.
+        """
+        if key is None:
+            raise ValueError('The key of a keyed event can\'t be None')
+        return self._schedulers[self._shard(key)].enterabs_keyed(key,
+                                                                 time,
+                                                                 priority,
+                                                                 action,
+                                                                 arguments,
+                                                                 kwargs,
+                                                                 mode,
+                                                                 max_lateness,
+                                                                 slack,
+                                                                 tenant,
+                                                                 tags)
+
+    def enter_keyed(self,
+                    key,
+                    delay,
+                    priority,
+                    action,
+                    arguments=(),
+                    kwargs=_sentinel,
+                    mode=KeyedMode.DEBOUNCE,
+                    max_lateness=None,
+                    slack=None,
+                    tenant=None,
+                    tags=None) -> Event:
+        """Enter a new keyed event in the queue of the shard of its key at a
+        time relative to the current time. See
+        :obj:`EventScheduler.enter_keyed`.
+        """
+        if key is None:
+            raise ValueError('The key of a keyed event can\'t be None')
+        return self._schedulers[self._shard(key)].enter_keyed(key,
+                                                              delay,
+                                                              priority,
+                                                              action,
+                                                              arguments,
+                                                              kwargs,
+                                                              mode,
+                                                              max_lateness,
+                                                              slack,
+                                                              tenant,
+                                                              tags)
+
+    def enterabs_many(self, events, key=None) -> list:
+        """Enter a batch of new events to occur at absolute times. The batch
+        is split by shard and every shard inserts its part at once. See
+        :obj:`EventScheduler.enterabs_many`.
+
+        Args:
+            key (hashable, optional): All the events are entered in the shard
+                of the key. If not set, every event is entered in the shard of
+                its own key, round-robin for the events without a key.
+
+        Returns:
+            list: The scheduled events in the order they were given if the
+            scheduler is running, None otherwise.
+        """
+        events = list(events)
+        if key is not None:
+            return self._schedulers[self._shard(key)].enterabs_many(events)
+        batches = {}
+        for position, event in enumerate(events):
+            # The key of an event follows its time, priority, action,
+            # arguments and kwargs
+            index = self._shard(event[5] if len(event) > 5 else None)
+            batches.setdefault(index, []).append((position, event))
+        result = [None] * len(events)
+        for index, batch in batches.items():
+            scheduled = self._schedulers[index].enterabs_many(
+                event for _, event in batch)
+            if scheduled is None:
+                return None
+            for (position, _), event in zip(batch, scheduled):
+                result[position] = event
+        return result
+
+    def enter_many(self, events, key=None) -> list:
+        """Enter a batch of new events to occur at times relative to the
+        current time. See :obj:`EventScheduler.enter_many`.
+
+        Args:
+            key (hashable, optional): All the events are entered in the shard
+                of the key. If not set, every event is entered in the shard of
+                its own key, round-robin for the events without a key.
+        """
+        now = self._schedulers[0].timefunc()
+        return self.enterabs_many(((now + delay, *rest)
+                                   for delay, *rest in events), key)
+
+    def enter_recurring(self,
+                        interval,
+                        priority,
+                        action,
+                        arguments=(),
+                        kwargs=_sentinel,
+                        catch_up=CatchUpPolicy.FIRE_ALL,
+                        key=None,
+                        max_lateness=None,
+                        slack=None,
+                        tenant=None,
+                        tags=None) -> int:
+        """Enter a new recurring event in the queue of a shard. See
+        :obj:`EventScheduler.enter_recurring`.
+
+        Args:
+            key (hashable, optional): Events with the same key are entered in
+                the same shard. Round-robin if not set.
+
+        Returns:
+            int: An event id of the recurring event if the scheduler is
+            running, None otherwise. The id is unique across shards.
+        """
+        index = self._shard(key)
+        event_id = self._schedulers[index].enter_recurring(interval,
+                                                           priority,
+                                                           action,
+                                                           arguments,
+                                                           kwargs,
+                                                           catch_up,
+                                                           key,
+                                                           max_lateness,
+                                                           slack,
+                                                           tenant,
+                                                           tags)
+        if event_id is None:
+            return None
+        # Encode the shard in the id
+        return event_id * len(self._schedulers) + index
+
+    def enter_periodic(self,
+                       interval,
+                       priority,
+                       action,
+                       arguments=(),
+                       key=None) -> int:
+        """Enter a new periodic job in the job table of a shard. See
+        :obj:`EventScheduler.enter_periodic`.
+
+        Args:
+            key (hashable, optional): Jobs with the same key are entered in
+                the same shard. Round-robin if not set.
+
+        Returns:
+            int: The id of the job if the scheduler is running, None
+            otherwise. The id is unique across shards.
+        """
+        index = self._shard(key)
+        job_id = self._schedulers[index].enter_periodic(interval,
+                                                        priority,
+                                                        action,
+                                                        arguments)
+        if job_id is None:
+            return None
+        # Encode the shard in the id
+        return job_id * len(self._schedulers) + index
+
+    def set_limit(self, key, max_concurrent=None, rate=None, burst=1):
+        """Limit the executions of the events entered with a key, in the
+        shard of the key. See :obj:`EventScheduler.set_limit`.
+        """
+        if key is None:
+            raise ValueError('The key of a limit can\'t be None')
+        self._schedulers[self._shard(key)].set_limit(key,
+                                                     max_concurrent,
+                                                     rate,
+                                                     burst)
+
+    def set_weight(self, tenant, weight):
+        """Set the weight of a tenant in every shard. See
+        :obj:`EventScheduler.set_weight`.
+        """
+        for scheduler in self._schedulers:
+            scheduler.set_weight(tenant, weight)
+
+    def cancel(self, event: Event) -> int:
+        """Remove an event from the queue of its shard. If the event is not in
+        any queue, this is a no-op. Every shard is checked, each in O(1).
+
+        Returns:
+            int: 0 if the event was successfully removed/not in the queue, -1
+            otherwise.
+        """
+        result = 0
+        for scheduler in self._schedulers:
+            result = min(result, scheduler.cancel(event))
+        return result
+
+    def reschedule(self, event: Event, time) -> Event:
+        """Move a pending one-shot event to a new absolute time, within its
+        shard. See :obj:`EventScheduler.reschedule`.
+        """
+        if event.key is not None:
+            return self._schedulers[self._shard(event.key)].reschedule(event,
+                                                                       time)
+        for scheduler in self._schedulers:
+            moved = scheduler.reschedule(event, time)
+            if moved is not None:
+                return moved
+        return None
+
+    def cancel_recurring(self, event_id) -> int:
+        """Remove recurring event from the queue of its shard using the id
+        returned by enter_recurring().
+
+        Returns:
+            int: 0 if the event was successfully removed/not in the queue, -1
+            otherwise.
+        """
+        local_id, index = divmod(event_id, len(self._schedulers))
+        return self._schedulers[index].cancel_recurring(local_id)
+
+    def cancel_periodic(self, job_id) -> int:
+        """Remove a periodic job from the job table of its shard using the id
+        returned by enter_periodic().
+
+        Returns:
+            int: 0 if the job was successfully removed/didn't exist, -1
+            otherwise.
+        """
+        local_id, index = divmod(job_id, len(self._schedulers))
+        return self._schedulers[index].cancel_periodic(local_id)
+
+    def skipped_ticks(self, event_id) -> int:
+        """Return the number of skipped occurrences of a recurring event. See
+        :obj:`EventScheduler.skipped_ticks`.
+        """
+        local_id, index = divmod(event_id, len(self._schedulers))
+        return self._schedulers[index].skipped_ticks(local_id)
+
+    def cancel_tag(self, tag) -> int:
+        """Remove the events entered with a tag from the queues of all the
+        shards. See :obj:`EventScheduler.cancel_tag`.
+
+        Returns:
+            int: The number of events cancelled, -1 if the scheduler isn't
+            running.
+        """
+        cancelled = [scheduler.cancel_tag(tag)
+                     for scheduler in self._schedulers]
+        if -1 in cancelled:
+            return -1
+        return sum(cancelled)
+
+    def cancel_all(self) -> int:
+        """Clear all events from the queues of all the shards.
+
+        Returns:
+            int: 0 if all the events were successfully cleared, -1 otherwise.
+        """
+        return min(scheduler.cancel_all() for scheduler in self._schedulers)
+
+    @property
+    def queue(self) -> list:
+        """Return an ordered list of upcoming events across all shards."""
+        return list(heapq.merge(*(scheduler.queue
+                                  for scheduler in self._schedulers)))
+
+    def __len__(self) -> int:
+        """Return the number of pending events across all shards."""
+        return sum(len(scheduler) for scheduler in self._schedulers)
+
+    def peek(self) -> Event:
+        """Return the next event to execute across all shards, None if the
+        queues are empty. See :obj:`EventScheduler.peek`.
+        """
+        events = [event for event in (scheduler.peek()
+                                      for scheduler in self._schedulers)
+                  if event is not None]
+        return min(events) if events else None
+
+    def iter_queue(self):
+        """Return an iterator over the upcoming events across all shards,
+        merging the lazily ordered iterators of the shards. See
+        :obj:`EventScheduler.iter_queue`.
+        """
+        return heapq.merge(*(scheduler.iter_queue()
+                             for scheduler in self._schedulers))
+
+    def events_for_action(self, action) -> list:
+        """Return the pending events of an action across all shards. See
+        :obj:`EventScheduler.events_for_action`.
+        """
+        return list(heapq.merge(*(scheduler.events_for_action(action)
+                                  for scheduler in self._schedulers)))
+
+    def events_for_tag(self, tag) -> list:
+        """Return the pending events entered with a tag across all shards.
+        See :obj:`EventScheduler.events_for_tag`.
+        """
+        return list(heapq.merge(*(scheduler.events_for_tag(tag)
+                                  for scheduler in self._schedulers)))
+
+    def stats(self) -> dict:
+        """Return a snapshot of the metrics of the shards.
+
+        Returns:
+            dict: The counters of all the shards summed up, and the stats of
+            every shard under 'shards'. See :obj:`EventScheduler.stats`.
+        """
+        shards = [scheduler.stats() for scheduler in self._schedulers]
+        stats = {key: sum(shard[key] for shard in shards)
+                 for key, value in shards[0].items()
+                 if isinstance(value, int)}
+        stats['shards'] = shards
+        return stats
+
+    def start(self) -> int:
+        """Start the event schedulers of all the shards.
+
+        Returns:
+            int: 0 if the event schedulers were successfully started, -1
+            otherwise.
+        """
+        return min(scheduler.start() for scheduler in self._schedulers)
+
+    def stop(self, hard_stop: bool = False) -> int:
+        """Stop the event schedulers of all the shards. See
+        :obj:`EventScheduler.stop`.
+
+        Returns:
+            int: 0 if the event schedulers were successfully stopped, -1
+            otherwise.
+        """
+        return min(scheduler.stop(hard_stop) for scheduler in self._schedulers)
@@ -0,0 +1,170 @@
+import sys
+
+from event_scheduler.event_scheduler import EventScheduler, SchedulerStatus
+
+
+class SimulatedEventScheduler(EventScheduler):
+    """
+    The Simulated Event Scheduler is an event scheduler running in virtual
+    time, without an internal thread. Events only execute when run_until() or
+    run_all() is called, on the calling thread, and the virtual clock jumps
+    from one event to the next, so schedules spanning days execute as fast as
+    the actions allow.
+
+    Runs are deterministic: events execute in order of time, priority and
+    entry, and actions entering new events see the virtual time of the event
+    executing.
+    """
+    def __init__(self, start_time=0, **kwargs):
+        """
+        Args:
+            start_time (float, optional): The initial virtual time.
+            **kwargs: Arguments of the :obj:`EventScheduler`, except the ones
+            about the clock and the executor since actions are always
+            executed by run_until() and run_all().
+
+        Raises:
+            ValueError: If a clock or executor argument is given.
+        """
+        for name in ('timefunc', 'timer_class', 'executor', 'max_workers',
+                     'max_processes', 'max_in_flight'):
+            if kwargs.get(name) is not None:
+                raise ValueError('{} is not supported by the simulated event '
+                                 'scheduler'.format(name))
+        kwargs.pop('timefunc', None)
+        super().__init__(timefunc=self._clock, **kwargs)
+        self._now = start_time
+
+    def _clock(self) -> float:
+        return self._now
+
+    def _notify(self):
+        # There's no internal thread to wake up
+        pass
+
+    def run_until(self, time) -> int:
+        """Execute the events due up to `time` in virtual time, then set the
+        virtual clock to `time`. Events entered by the actions are executed
+        too if they're due by then.
+
+        Args:
+            time: The virtual time to run until.
+
+        Returns:
+            int: The number of events executed.
+
+        Raises:
+            ValueError: If time is before the current virtual time.
+        """
+        if time < self._now:
+            raise ValueError('The virtual time can\'t go backwards')
+        return self._run_until(time)
+
+    def run_all(self) -> int:
+        """Execute events until the queue is empty. The virtual clock is left
+        at the time of the last event.
+
+        Returns:
+            int: The number of events executed.
+
+        Warning:
+            Recurring events are rescheduled forever, cancel them or use
+            run_until() instead.
+        """
+        return self._run_until(None)
+
+    def _run_until(self, time):
+        executed = 0
+        with self._lock:
+            q = self._queue
+            pending = self._pending
+            peek = q.peek
+            pop = q.pop
+            take_due = self._take_due
+            execute = self._execute
+            fair = self._fair
+            while True:
+                # Discard the tombstones of cancelled events
+                while q and id(peek()[3]) not in pending:
+                    pop()
+                if fair:
+                    # Due events are waiting for the turn of their tenant,
+                    # dispatch them right away.
+                    due, priority = self._now, 0
+                elif not q:
+                    break
+                else:
+                    due, priority = peek()[:2]
+                if priority == sys.maxsize:
+                    break
+                if due > self._now:
+                    # Jump to the wakeup of the internal thread, which is
+                    # later than the event with slack.
+                    due = self._wakeup_time(due)
+                    if time is not None and due > time:
+                        break
+                    self._now = due
+                batch = take_due(self._now)
+                if batch:
+                    execute(batch)
+                    executed += len(batch)
+            if time is not None:
+                self._now = time
+        return executed
+
+    def start(self) -> int:
+        """Enable the scheduler to start taking events. The virtual clock
+        isn't reset.
+
+        Returns:
+            int: 0 if the event scheduler was successfully started, -1 if the
+            scheduler has already been started.
+
+        Raises:
+            ValueError: If the action of an event of the journal isn't in its
+                registry. The scheduler isn't started.
+        """
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.STOPPED:
+                return -1
+            journal = self._journal_config
+            if journal is not None:
+                restored = journal.open(self.timefunc)
+            self._scheduler_status = SchedulerStatus.RUNNING
+            if self._watchdog is not None:
+                self._watchdog.start()
+            if journal is not None:
+                self._restore(journal, restored)
+        return 0
+
+    def stop(self, hard_stop: bool = False) -> int:
+        """Stop the event scheduler. Will not be able to take in new events
+        when invoked.
+
+        Args:
+            hard_stop (bool, optional): If set to `False`, run the pending
+                events in virtual time before stopping, recurring events
+                aren't rescheduled anymore. If set to `True`, discard all
+                pending events. The periodic jobs are removed either way.
+
+        Returns:
+            int: 0 if the event scheduler was successfully stopped, -1 if it
+            was already stopped.
+        """
+        with self._lock:
+            if self._scheduler_status != SchedulerStatus.RUNNING:
+                return -1
+            if hard_stop:
+                # The pending events stay in the journal, to be restored the
+                # next time a scheduler starts with it.
+                self._close_journal()
+                self.cancel_all()
+            self._stop_periodic()
+            self._scheduler_status = SchedulerStatus.STOPPING
+        self.run_all()
+        self._close_journal()
+        if self._watchdog is not None:
+            self._watchdog.stop()
+        with self._lock:
+            self._scheduler_status = SchedulerStatus.STOPPED
+        return 0
@@ -0,0 +1,132 @@
+import itertools
+import sys
+import threading
+from time import perf_counter
+import traceback
+
+
+class Watchdog:
+    """The Watchdog reports the actions of an event scheduler which have been
+    executing for longer than a threshold, with the stack of the thread
+    executing them, so a hung action can be found while it's still running.
+
+    The watchdog checks the executing actions from its own thread, twice per
+    threshold. Every slow action is only reported once. The stack of actions
+    submitted to a process pool aren't watched.
+
+    A watchdog can be shared by several event schedulers, its thread runs
+    while at least one of them is running.
+    """
+    def __init__(self, threshold, callback=None, dump_stack=True):
+        """
+        Args:
+            threshold (float): The number of seconds after which an executing
+                action is reported.
+            callback (callable, optional): A function called with the event
+                (or the batch of events given to a batch handler), the number
+                of seconds it has been executing and the formatted stack of
+                its thread, None if not available. The report is written to
+                stderr by default.
+            dump_stack (bool, optional): If set to `False`, the stack isn't
+                collected and the callback receives None.
+
+        Raises:
+            ValueError: If threshold isn't greater than 0.
+        """
+        if threshold <= 0:
+            raise ValueError('The threshold must be greater than 0')
+        self._threshold = threshold
+        self._callback = callback or self._report
+        self._dump_stack = dump_stack
+        self._lock = threading.Lock()
+        # Executing actions (key: token, value: [subject, start time, thread
+        # ident, reported])
+        self._running = {}
+        self._tokens = itertools.count()
+        # Set to stop the current watchdog thread
+        self._stopped = None
+        self._thread = None
+        # Number of running schedulers using the watchdog
+        self._users = 0
+        # Number of actions reported as slow
+        self.reported = 0
+
+    @staticmethod
+    def _report(subject, elapsed, stack):
+        sys.stderr.write('Event scheduler action executing for {:.3f} '
+                         'seconds: {!r}\n'.format(elapsed, subject))
+        if stack:
+            sys.stderr.write(stack)
+
+    def started(self, subject, thread_ident=None) -> int:
+        """Register an action which starts executing.
+
+        Args:
+            subject: The event, or the batch of events, of the action.
+            thread_ident (int, optional): The identifier of the thread
+                executing the action.
+
+        Returns:
+            int: A token to pass to finished().
+        """
+        token = next(self._tokens)
+        with self._lock:
+            self._running[token] = [subject, perf_counter(), thread_ident,
+                                    False]
+        return token
+
+    def finished(self, token):
+        """Unregister an action which completed."""
+        with self._lock:
+            self._running.pop(token, None)
+
+    def check(self):
+        """Report the actions executing for longer than the threshold."""
+        now = perf_counter()
+        slow = []
+        with self._lock:
+            for running in self._running.values():
+                subject, started, thread_ident, reported = running
+                if not reported and now - started > self._threshold:
+                    running[3] = True
+                    slow.append((subject, now - started, thread_ident))
+        if not slow:
+            return
+        frames = sys._current_frames() if self._dump_stack else {}
+        for subject, elapsed, thread_ident in slow:
+            frame = frames.get(thread_ident)
+            stack = ''.join(traceback.format_stack(frame)) if frame else None
+            self.reported += 1
+            self._callback(subject, elapsed, stack)
+
+    def _watch(self, stopped):
+        while not stopped.wait(self._threshold / 2):
+            self.check()
+
+    def start(self):
+        """Start the watchdog thread. Called by the event scheduler when it
+        starts.
+        """
+        with self._lock:
+            self._users += 1
+            if self._users > 1:
+                return
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(target=self._watch,
+                                            args=(self._stopped,),
+                                            name='event_scheduler_watchdog',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the watchdog thread. Called by the event scheduler when it
+        stops.
+        """
+        with self._lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            thread, self._thread = self._thread, None
+            self._stopped.set()
+        if thread is not None:
+            thread.join()
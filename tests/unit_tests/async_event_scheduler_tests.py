@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from event_scheduler.async_event_scheduler import AsyncEventScheduler
+from event_scheduler.event_scheduler import CatchUpPolicy
+import unittest
+
+
+def insert_into_list(item, list_obj: list):
+    list_obj.append(item)
+
+
+async def insert_into_list_async(item, list_obj: list):
+    await asyncio.sleep(0)
+    list_obj.append(item)
+
+
+class AsyncEventSchedulerTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_breathing(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            self.assertEqual(event_scheduler.start(), 0)
+            self.assertEqual(event_scheduler.start(), -1)
+            self.assertEqual(await event_scheduler.stop(), 0)
+            self.assertEqual(await event_scheduler.stop(), -1)
+            self.assertIsNone(event_scheduler.enter(0, 0, print))
+        self.run_async(scenario())
+
+    def test_priority_and_time(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            now = event_scheduler.timefunc()
+            event_scheduler.enterabs(now + 0.02, 1, insert_into_list,
+                                     ('C', result_list))
+            event_scheduler.enterabs(now + 0.01, 2, insert_into_list,
+                                     ('B', result_list))
+            event_scheduler.enterabs(now + 0.01, 1, insert_into_list,
+                                     ('A', result_list))
+            self.assertEqual(len(event_scheduler.queue), 3)
+            await asyncio.sleep(0.015)
+            self.assertListEqual(result_list, ['A', 'B'])
+            await event_scheduler.stop()
+            self.assertListEqual(result_list, ['A', 'B', 'C'])
+        self.run_async(scenario())
+
+    def test_coroutine_action(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            event_scheduler.enter(0, 0, insert_into_list_async,
+                                  ('A', result_list))
+            await event_scheduler.stop()
+            self.assertListEqual(result_list, ['A'])
+        self.run_async(scenario())
+
+    def test_cancel(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            event = event_scheduler.enter(0.01, 0, insert_into_list,
+                                          ('A', result_list))
+            event_scheduler.enter(0.02, 0, insert_into_list,
+                                  ('B', result_list))
+            event_scheduler.cancel(event)
+            await event_scheduler.stop()
+            self.assertListEqual(result_list, ['B'])
+        self.run_async(scenario())
+
+    def test_recurring_event(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            event_id = event_scheduler.enter_recurring(0.01, 0,
+                                                       insert_into_list,
+                                                       ('A', result_list))
+            await asyncio.sleep(0.035)
+            self.assertEqual(event_scheduler.cancel_recurring(event_id), 0)
+            count = len(result_list)
+            self.assertGreaterEqual(count, 2)
+            await asyncio.sleep(0.02)
+            self.assertEqual(len(result_list), count)
+            await event_scheduler.stop()
+        self.run_async(scenario())
+
+    def test_recurring_coalesce(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            event_id = event_scheduler.enter_recurring(
+                0.01,
+                0,
+                insert_into_list,
+                ('A', result_list),
+                catch_up=CatchUpPolicy.COALESCE)
+            # Block the event loop for several intervals
+            event_scheduler.enter(0, 0, time.sleep, (0.045,))
+            await asyncio.sleep(0.05)
+            self.assertLessEqual(len(result_list), 2)
+            self.assertGreaterEqual(event_scheduler.skipped_ticks(event_id),
+                                    2)
+            await event_scheduler.stop(True)
+        self.run_async(scenario())
+
+    def test_hard_stop(self):
+        async def scenario():
+            event_scheduler = AsyncEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            event_scheduler.enter(30, 0, insert_into_list, ('A', result_list))
+            await event_scheduler.stop(True)
+            self.assertListEqual(result_list, [])
+        self.run_async(scenario())
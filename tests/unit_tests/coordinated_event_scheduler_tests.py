@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from time import sleep
+from time import time as wall_time
+
+from event_scheduler.coordinated_event_scheduler import \
+    CoordinatedEventScheduler
+import unittest
+
+
+RESULTS = []
+RESULTS_LOCK = threading.Lock()
+
+
+def record_result(item):
+    with RESULTS_LOCK:
+        RESULTS.append(item)
+
+
+def record_other(item):
+    record_result(('other', item))
+
+
+ACTIONS = {'record_result': record_result}
+TEST_THREAD = "test_thread"
+
+
+class CoordinatedEventSchedulerTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'events.db')
+        RESULTS.clear()
+
+    def create_schedulers(self, count, actions=ACTIONS, **kwargs):
+        schedulers = [CoordinatedEventScheduler(self.path,
+                                                actions,
+                                                poll_interval=0.01,
+                                                thread_name=TEST_THREAD,
+                                                **kwargs)
+                      for _ in range(count)]
+        for event_scheduler in schedulers:
+            self.assertEqual(event_scheduler.start(), 0)
+            # Stopped even if the test fails, before the store is removed
+            self.addCleanup(event_scheduler.stop)
+        return schedulers
+
+    def wait_until(self, condition, timeout=5):
+        deadline = wall_time() + timeout
+        while not condition():
+            if wall_time() > deadline:
+                self.fail('Timed out waiting for the coordinated schedulers')
+            sleep(0.005)
+
+    def insert_event(self, action, due, owner=None, lease_expiry=None):
+        """Insert an event in the store as another process would."""
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                "INSERT INTO events (due, priority, action, arguments, "
+                "kwargs, owner, lease_expiry) VALUES (?, 0, ?, '[\"A\"]', "
+                "'{}', ?, ?)",
+                (due, action, owner, lease_expiry))
+        connection.close()
+
+    def test_breathing(self):
+        event_scheduler = CoordinatedEventScheduler(self.path, ACTIONS)
+        self.assertIsNone(event_scheduler.enter(0, 0, record_result, ('A',)))
+        self.assertEqual(event_scheduler.start(), 0)
+        self.assertEqual(event_scheduler.start(), -1)
+        with self.assertRaises(ValueError):
+            event_scheduler.enter(0, 0, print)
+        with self.assertRaises(ValueError):
+            event_scheduler.enter(0, 0, record_result, (object(),))
+        self.assertEqual(event_scheduler.stop(), 0)
+        self.assertEqual(event_scheduler.stop(), -1)
+
+    def test_events_execute_once(self):
+        schedulers = self.create_schedulers(3)
+        for index in range(30):
+            schedulers[index % 3].enter(0.01, 0, record_result, (index,))
+        cancelled = schedulers[0].enter(0.05, 0, record_result, ('X',))
+        schedulers[1].cancel(cancelled)
+        # The executed events and the cancelled one leave the store
+        self.wait_until(
+            lambda: schedulers[0].stats()['queue_depth'] == 0)
+        for event_scheduler in schedulers:
+            event_scheduler.stop()
+        self.assertListEqual(sorted(RESULTS), list(range(30)))
+
+    def test_named_recurring_event(self):
+        schedulers = self.create_schedulers(3)
+        start = wall_time()
+        ids = {event_scheduler.enter_recurring(0.05,
+                                               0,
+                                               record_result,
+                                               ('R',),
+                                               name='job')
+               for event_scheduler in schedulers}
+        # Every process gets the same recurring event
+        self.assertEqual(len(ids), 1)
+        self.wait_until(lambda: len(RESULTS) >= 3)
+        for event_scheduler in schedulers:
+            event_scheduler.stop()
+        # The occurrences are at least an interval apart, they'd be three
+        # times as many if every scheduler executed the event.
+        self.assertLessEqual(len(RESULTS), (wall_time() - start) / 0.05)
+
+    def test_expired_lease_reclaimed(self):
+        self.create_schedulers(1)[0].stop()
+        # An event leased by a process which crashed
+        self.insert_event('record_result',
+                          wall_time() - 1,
+                          owner='crashed',
+                          lease_expiry=wall_time() + 60)
+        event_scheduler, = self.create_schedulers(1)
+        self.assertEqual(event_scheduler.stats()['leased'], 1)
+        sleep(0.05)
+        self.assertListEqual(RESULTS, [])
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute('UPDATE events SET lease_expiry = ?',
+                               (wall_time() - 1,))
+        connection.close()
+        self.wait_until(
+            lambda: event_scheduler.stats()['queue_depth'] == 0)
+        self.assertListEqual(RESULTS, ['A'])
+        event_scheduler.stop()
+
+    def test_action_not_in_registry(self):
+        self.create_schedulers(1)[0].stop()
+        # An event of a peer with a larger registry, due first
+        self.insert_event('record_other', wall_time() - 2)
+        self.insert_event('record_result', wall_time() - 1)
+        event_scheduler, = self.create_schedulers(1)
+        # The event of the peer is left in the store and polling goes on
+        self.wait_until(lambda: RESULTS == ['A'])
+        event_scheduler.enter(0, 0, record_result, ('B',))
+        self.wait_until(lambda: RESULTS == ['A', 'B'])
+        self.assertDictEqual(event_scheduler.stats(),
+                             {'queue_depth': 1, 'leased': 0})
+        peer, = self.create_schedulers(
+            1, actions=dict(ACTIONS, record_other=record_other))
+        self.wait_until(lambda: peer.stats()['queue_depth'] == 0)
+        event_scheduler.stop()
+        peer.stop()
+        self.assertListEqual(RESULTS, ['A', 'B', ('other', 'A')])
@@ -1,6 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
 import sys
+import threading
+from time import sleep
 
-from event_scheduler.event_scheduler import EventScheduler
+from event_scheduler.event_scheduler import CatchUpPolicy, EventScheduler, \
+    KeyedMode
 from event_scheduler.test_util import TestTimer
 import unittest
 
@@ -9,6 +13,10 @@ def insert_into_list(item, list_obj: list):
     list_obj.append(item)
 
 
+def do_nothing(*arguments):
+    pass
+
+
 TEST_THREAD = "test_thread"
 
 
@@ -371,3 +379,798 @@ class EventSchedulerTests(unittest.TestCase):
         event_scheduler.enterabs(30, 1, insert_into_list, ('A', result_list))
         event_scheduler.stop(True)
         self.assertListEqual(result_list, [])
+
+    def test_cancel_event_same_time_and_priority(self):
+        # Only the cancelled event should be removed even if other events
+        # share its time and priority.
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enterabs(2, 1, insert_into_list, ('A', result_list))
+        event = event_scheduler.enterabs(2,
+                                         1,
+                                         insert_into_list,
+                                         ('B', result_list))
+        event_scheduler.cancel(event)
+        self.assertEqual(len(event_scheduler.queue), 1)
+        TestTimer.advance_time(2)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A'])
+
+    def test_cancel_many_events(self):
+        # Cancelling most of the events compacts the queue
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        events = [event_scheduler.enterabs(i,
+                                           0,
+                                           insert_into_list,
+                                           (i, result_list))
+                  for i in range(1, 5001)]
+        for event in events:
+            if event.time % 1000:
+                event_scheduler.cancel(event)
+        self.assertLess(len(event_scheduler._queue), 5000)
+        self.assertListEqual([event.time for event in event_scheduler.queue],
+                             [1000, 2000, 3000, 4000, 5000])
+        TestTimer.advance_time(5000)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, [1000, 2000, 3000, 4000, 5000])
+
+    def test_executor_slow_action(self):
+        # A slow action running on the thread pool shouldn't stall the
+        # dispatch of other events.
+        event_scheduler = EventScheduler(TEST_THREAD, max_workers=2)
+        event_scheduler.start()
+        result_list = []
+        release = threading.Event()
+        done = threading.Event()
+        event_scheduler.enter(0, 0, release.wait, (5,))
+        event_scheduler.enter(0.1, 0, insert_into_list, ('A', result_list))
+        event_scheduler.enter(0.1, 1, done.set)
+        self.assertTrue(done.wait(5))
+        self.assertListEqual(result_list, ['A'])
+        release.set()
+        event_scheduler.stop()
+
+    def test_user_supplied_executor(self):
+        executor = ThreadPoolExecutor(1)
+        event_scheduler = EventScheduler(TEST_THREAD, executor=executor)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter(0, 0, insert_into_list, ('A', result_list))
+        event_scheduler.stop()
+        # The executor isn't owned by the scheduler so it's still usable
+        executor.submit(insert_into_list, 'B', result_list).result()
+        executor.shutdown()
+        self.assertListEqual(result_list, ['A', 'B'])
+
+    def test_enter_many(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        self.assertIsNone(event_scheduler.enter_many([]))
+        event_scheduler.start()
+        result_list = []
+        events = event_scheduler.enterabs_many(
+            [(2, 1, insert_into_list, ('C', result_list)),
+             (1, 1, insert_into_list, (), {'item': 'A',
+                                           'list_obj': result_list}),
+             (2, 0, insert_into_list, ('B', result_list))])
+        self.assertListEqual([event.time for event in events], [2, 1, 2])
+        event_scheduler.cancel(events[0])
+        event_scheduler.enter_many([(3, 0, insert_into_list,
+                                     ('D', result_list))])
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A'])
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A', 'B'])
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'B', 'D'])
+
+    def test_enter_many_invalid_priority(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        event_scheduler.start()
+        result_list = []
+        with self.assertRaises(ValueError):
+            event_scheduler.enter_many([(0, 0, insert_into_list,
+                                         ('A', result_list)),
+                                        (0, -1, insert_into_list,
+                                         ('B', result_list))])
+        self.assertListEqual(event_scheduler.queue, [])
+        event_scheduler.stop()
+        self.assertListEqual(result_list, [])
+
+    def test_wait_without_timer_threads(self):
+        # The default wakeup engine doesn't spawn a timer thread and wakes up
+        # early when a sooner event is entered.
+        event_scheduler = EventScheduler(TEST_THREAD)
+        thread_count = threading.active_count()
+        event_scheduler.start()
+        done = threading.Event()
+        event_scheduler.enter(30, 0, done.set)
+        event_scheduler.enter(0.2,
+                              0,
+                              event_scheduler.enter,
+                              (0.1, 0, done.set))
+        self.assertTrue(done.wait(5))
+        self.assertEqual(threading.active_count(), thread_count + 1)
+        event_scheduler.stop(True)
+
+    def test_process_pool(self):
+        results = []
+        event_scheduler = EventScheduler(
+            TEST_THREAD,
+            max_processes=2,
+            done_callback=lambda event, future: results.append(future))
+        event_scheduler.start()
+        event_scheduler.enter(0, 0, pow, (2, 10))
+        event_scheduler.enter(0, 1, int, ('not a number',))
+        # Actions must be picklable to be sent to the worker processes
+        with self.assertRaises(ValueError):
+            event_scheduler.enter(0, 0, lambda: None)
+        with self.assertRaises(ValueError):
+            event_scheduler.enter_recurring(1, 0, print, (threading.Lock(),))
+        event_scheduler.stop()
+        self.assertEqual(len(results), 2)
+        outcomes = [future.exception() or future.result()
+                    for future in results]
+        self.assertIn(1024, outcomes)
+        self.assertTrue(any(isinstance(outcome, ValueError)
+                            for outcome in outcomes))
+        with self.assertRaises(ValueError):
+            EventScheduler(TEST_THREAD, max_workers=1, max_processes=1)
+
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def track():
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         max_workers=4,
+                                         max_in_flight=2)
+        event_scheduler.start()
+        for _ in range(10):
+            event_scheduler.enter(0, 0, track)
+        event_scheduler.stop()
+        self.assertEqual(running[0], 0)
+        self.assertLessEqual(max_running[0], 2)
+
+    def test_stats(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         metrics=True)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enterabs(1, 0, insert_into_list, ('A', result_list))
+        event_scheduler.enterabs(1, 1, insert_into_list, ('B', result_list))
+        event = event_scheduler.enterabs(5,
+                                         0,
+                                         insert_into_list,
+                                         ('C', result_list))
+        event_scheduler.cancel(event)
+        stats = event_scheduler.stats()
+        self.assertEqual(stats['queue_depth'], 2)
+        self.assertEqual(stats['entered'], 3)
+        self.assertEqual(stats['cancelled'], 1)
+        TestTimer.advance_time(3)
+        stats = event_scheduler.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['executed'], 2)
+        self.assertEqual(stats['lag']['count'], 2)
+        self.assertEqual(stats['lag']['max'], 2)
+        self.assertEqual(stats['duration']['count'], 2)
+        event_scheduler.stop()
+
+    def test_stats_disabled(self):
+        event_scheduler = EventScheduler(TEST_THREAD)
+        event_scheduler.start()
+        event_scheduler.enter(30, 0, print)
+        self.assertDictEqual(event_scheduler.stats(),
+                             {'queue_depth': 1, 'recurring_events': 0})
+        event_scheduler.stop(True)
+
+    def test_batch_dispatch(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         batch_dispatch=True)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enterabs(2, 1, insert_into_list, ('C', result_list))
+        event_scheduler.enterabs(1, 1, insert_into_list, ('A', result_list))
+        event_scheduler.enterabs(2, 0, insert_into_list, ('B', result_list))
+        event_scheduler.enterabs(4, 0, insert_into_list, ('D', result_list))
+        TestTimer.advance_time(3)
+        self.assertListEqual(result_list, ['A', 'B', 'C'])
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'B', 'C', 'D'])
+
+    def test_batch_handler(self):
+        batches = []
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         batch_handler=batches.append)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        event_scheduler.enterabs(2, 1, print, ('B',))
+        event_scheduler.enterabs(1, 1, print, ('A',))
+        event_scheduler.enter_recurring(5, 0, print, ('R',))
+        event_scheduler.enterabs(7, 0, print, ('C',))
+        TestTimer.advance_time(5)
+        TestTimer.advance_time(5)
+        event_scheduler.stop(True)
+        self.assertListEqual([[event.argument[0] for event in batch]
+                              for batch in batches],
+                             [['A', 'B', 'R'], ['C', 'R']])
+
+    def test_same_time_and_priority_fifo(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        items = [str(i) for i in range(50)]
+        events = [event_scheduler.enterabs(1,
+                                           0,
+                                           insert_into_list,
+                                           (item, result_list))
+                  for item in items]
+        self.assertTrue(all(queued is event for queued, event
+                            in zip(event_scheduler.queue, events)))
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, items)
+
+    def test_introspection(self):
+        for index_actions in (False, True):
+            event_scheduler = EventScheduler(TEST_THREAD,
+                                             TestTimer.monotonic,
+                                             TestTimer,
+                                             index_actions=index_actions)
+            TestTimer.set_event_scheduler(event_scheduler)
+            event_scheduler.start()
+            self.assertEqual(len(event_scheduler), 0)
+            self.assertIsNone(event_scheduler.peek())
+            result_list = []
+            events = [event_scheduler.enterabs(time,
+                                               0,
+                                               insert_into_list,
+                                               (time, result_list))
+                      for time in (5, 3, 4, 1, 2)]
+            other = event_scheduler.enterabs(3, 1, do_nothing, ('P',))
+            event_scheduler.cancel(events[3])
+            self.assertEqual(len(event_scheduler), 5)
+            self.assertIs(event_scheduler.peek(), events[4])
+            upcoming = event_scheduler.iter_queue()
+            self.assertListEqual([next(upcoming) for _ in range(3)],
+                                 [events[4], events[1], other])
+            self.assertListEqual(list(upcoming), [events[2], events[0]])
+            self.assertListEqual(
+                event_scheduler.events_for_action(insert_into_list),
+                [events[4], events[1], events[2], events[0]])
+            self.assertListEqual(
+                event_scheduler.events_for_action(do_nothing), [other])
+            TestTimer.advance_time(3)
+            self.assertEqual(len(event_scheduler), 2)
+            self.assertListEqual(
+                event_scheduler.events_for_action(do_nothing), [])
+            self.assertListEqual(
+                event_scheduler.events_for_action(insert_into_list),
+                [events[2], events[0]])
+            event_scheduler.stop(True)
+            self.assertEqual(len(event_scheduler), 0)
+            TestTimer.reset()
+
+    def test_recurring_catch_up(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         metrics=True)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        fire_all = event_scheduler.enter_recurring(1,
+                                                   0,
+                                                   insert_into_list,
+                                                   ('A', result_list))
+        coalesce = event_scheduler.enter_recurring(
+            1,
+            1,
+            insert_into_list,
+            ('C', result_list),
+            catch_up=CatchUpPolicy.COALESCE)
+        TestTimer.advance_time(3.5)
+        self.assertEqual(result_list.count('A'), 3)
+        self.assertEqual(result_list.count('C'), 1)
+        self.assertEqual(event_scheduler.skipped_ticks(coalesce), 2)
+        self.assertEqual(event_scheduler.skipped_ticks(fire_all), 0)
+        self.assertEqual(event_scheduler.stats()['skipped_ticks'], 2)
+        TestTimer.advance_time(0.5)
+        self.assertEqual(result_list.count('A'), 4)
+        self.assertEqual(result_list.count('C'), 2)
+        event_scheduler.cancel_recurring(coalesce)
+        self.assertEqual(event_scheduler.skipped_ticks(coalesce), 0)
+        event_scheduler.stop(True)
+
+    def test_recurring_fixed_delay(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter_recurring(2,
+                                        0,
+                                        insert_into_list,
+                                        ('A', result_list),
+                                        catch_up=CatchUpPolicy.FIXED_DELAY)
+        TestTimer.advance_time(5)
+        self.assertListEqual(result_list, ['A'])
+        # The next occurrence is 2 seconds after the action completed
+        self.assertEqual(event_scheduler.peek().time, 7)
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A'])
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A', 'A'])
+        event_scheduler.stop(True)
+
+    def test_recurring_fixed_delay_executor(self):
+        done = threading.Event()
+        event_scheduler = EventScheduler(TEST_THREAD, max_workers=2)
+        event_scheduler.start()
+        result_list = []
+
+        def slow_action():
+            result_list.append(event_scheduler.timefunc())
+            sleep(0.05)
+            if len(result_list) == 2:
+                done.set()
+
+        event_scheduler.enter_recurring(0.01,
+                                        0,
+                                        slow_action,
+                                        catch_up=CatchUpPolicy.FIXED_DELAY)
+        self.assertTrue(done.wait(5))
+        event_scheduler.stop(True)
+        # Never more than one execution at a time
+        self.assertGreaterEqual(result_list[1] - result_list[0], 0.06)
+
+    def test_rate_limit(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        event_scheduler.set_limit('k', rate=1)
+        result_list = []
+        for item in ('A', 'B', 'C'):
+            event_scheduler.enterabs(1,
+                                     0,
+                                     insert_into_list,
+                                     (item, result_list),
+                                     key='k')
+        event_scheduler.enterabs(1, 1, insert_into_list, ('D', result_list))
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A', 'D'])
+        # The deferred events are still pending in the queue
+        self.assertEqual(len(event_scheduler), 2)
+        self.assertEqual(event_scheduler.peek().argument[0], 'B')
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A', 'D', 'B'])
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'D', 'B', 'C'])
+
+    def test_concurrency_limit(self):
+        lock = threading.Lock()
+        running = {'k': 0, None: 0}
+        max_running = {'k': 0, None: 0}
+
+        def track(key):
+            with lock:
+                running[key] += 1
+                max_running[key] = max(max_running[key], running[key])
+            sleep(0.02)
+            with lock:
+                running[key] -= 1
+
+        event_scheduler = EventScheduler(TEST_THREAD, max_workers=4)
+        event_scheduler.start()
+        event_scheduler.set_limit('k', max_concurrent=1)
+        for _ in range(5):
+            event_scheduler.enter(0, 0, track, ('k',), key='k')
+            event_scheduler.enter(0, 0, track, (None,))
+        # Stopping waits for the events waiting for their key
+        event_scheduler.stop()
+        self.assertEqual(max_running['k'], 1)
+        self.assertGreater(max_running[None], 1)
+        self.assertEqual(len(event_scheduler), 0)
+
+    def test_set_limit_invalid(self):
+        event_scheduler = EventScheduler(TEST_THREAD)
+        with self.assertRaises(ValueError):
+            event_scheduler.set_limit(None, max_concurrent=1)
+        with self.assertRaises(ValueError):
+            event_scheduler.set_limit('k', max_concurrent=0)
+        with self.assertRaises(ValueError):
+            event_scheduler.set_limit('k', rate=-1)
+
+    def test_shed_late_events(self):
+        shed = []
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         metrics=True,
+                                         max_lateness=1,
+                                         shed_callback=shed.append)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        late = event_scheduler.enterabs(1,
+                                        0,
+                                        insert_into_list,
+                                        ('A', result_list))
+        event_scheduler.enterabs(1,
+                                 1,
+                                 insert_into_list,
+                                 ('B', result_list),
+                                 max_lateness=5)
+        event_scheduler.enterabs(3, 0, insert_into_list, ('C', result_list))
+        event_scheduler.enter_recurring(1,
+                                        1,
+                                        insert_into_list,
+                                        ('R', result_list),
+                                        max_lateness=0.5)
+        TestTimer.advance_time(3)
+        self.assertListEqual(result_list, ['B', 'C', 'R'])
+        # The recurring event was shed at 1 and 2, and rescheduled
+        self.assertIs(shed[0], late)
+        self.assertListEqual([event.argument[0] for event in shed],
+                             ['A', 'R', 'R'])
+        stats = event_scheduler.stats()
+        self.assertEqual(stats['shed'], 3)
+        self.assertEqual(stats['executed'], 3)
+        self.assertEqual(len(event_scheduler), 1)
+        event_scheduler.stop(True)
+
+    def test_keyed_events(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        for time, item in ((2, 'A1'), (3, 'A2')):
+            event_scheduler.enterabs_keyed('A',
+                                           time,
+                                           0,
+                                           insert_into_list,
+                                           (item, result_list))
+        for time, item in ((2, 'T1'), (1, 'T2')):
+            event_scheduler.enterabs_keyed('T',
+                                           time,
+                                           0,
+                                           insert_into_list,
+                                           (item, result_list),
+                                           mode=KeyedMode.THROTTLE)
+        for time, item in ((2, 'E1'), (1, 'E2'), (3, 'E3')):
+            event_scheduler.enterabs_keyed('E',
+                                           time,
+                                           0,
+                                           insert_into_list,
+                                           (item, result_list),
+                                           mode=KeyedMode.KEEP_EARLIEST)
+        self.assertEqual(len(event_scheduler), 3)
+        TestTimer.advance_time(3)
+        self.assertListEqual(result_list, ['E2', 'T1', 'A2'])
+        # Once executed, a new event can be entered for the key
+        event = event_scheduler.enter_keyed('A',
+                                            1,
+                                            0,
+                                            insert_into_list,
+                                            ('A3', result_list))
+        self.assertEqual(event.time, 4)
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['E2', 'T1', 'A2', 'A3'])
+        with self.assertRaises(ValueError):
+            event_scheduler.enter_keyed(None, 0, 0, print)
+
+    def test_reschedule(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event = event_scheduler.enterabs(5,
+                                         0,
+                                         insert_into_list,
+                                         ('A', result_list))
+        event_scheduler.enterabs(2, 0, insert_into_list, ('B', result_list))
+        moved = event_scheduler.reschedule(event, 1)
+        self.assertEqual(moved.time, 1)
+        self.assertListEqual([queued.argument[0]
+                              for queued in event_scheduler.queue],
+                             ['A', 'B'])
+        # The old handle isn't pending anymore
+        self.assertIsNone(event_scheduler.reschedule(event, 3))
+        with self.assertRaises(ValueError):
+            event_scheduler.reschedule(moved._replace(id=1), 3)
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A'])
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'B'])
+
+    def test_dispatch_hooks(self):
+        traces = []
+        event_scheduler = EventScheduler(
+            TEST_THREAD,
+            TestTimer.monotonic,
+            TestTimer,
+            before_dispatch=lambda event, started: traces.append(
+                ('before', event.argument[0], started)),
+            after_dispatch=lambda event, started, duration: traces.append(
+                ('after', event.argument[0], started)))
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter(1, 0, insert_into_list, ('A', result_list))
+        TestTimer.advance_time(2)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A'])
+        self.assertListEqual(traces, [('before', 'A', 2), ('after', 'A', 2)])
+        with self.assertRaises(ValueError):
+            EventScheduler(trace_sample_rate=2)
+        with self.assertRaises(ValueError):
+            EventScheduler(max_processes=1, before_dispatch=print)
+
+    def test_dispatch_hooks_sampling(self):
+        traces = []
+        event_scheduler = EventScheduler(
+            TEST_THREAD,
+            max_workers=2,
+            after_dispatch=lambda event, started, duration: traces.append(
+                duration),
+            trace_sample_rate=0)
+        event_scheduler.start()
+        result_list = []
+        for i in range(10):
+            event_scheduler.enter(0, 0, insert_into_list, (i, result_list))
+        event_scheduler.stop()
+        # Actions execute but aren't traced
+        self.assertEqual(len(result_list), 10)
+        self.assertListEqual(traces, [])
+
+    def test_slack(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         slack=5)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter(1, 0, insert_into_list, ('A', result_list))
+        # Executes on time, along with the event with slack
+        event_scheduler.enter(3,
+                              0,
+                              insert_into_list,
+                              ('B', result_list),
+                              slack=0)
+        # Let the internal thread set its timer before time passes
+        TestTimer.advance_time(0)
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, [])
+        TestTimer.advance_time(2)
+        self.assertListEqual(result_list, ['A', 'B'])
+        event_scheduler.enter(1, 0, insert_into_list, ('C', result_list))
+        TestTimer.advance_time(0)
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A', 'B'])
+        TestTimer.advance_time(5)
+        self.assertListEqual(result_list, ['A', 'B', 'C'])
+        event_scheduler.stop()
+
+    def test_slack_deadlines_dropped(self):
+        # The deadlines of the executed events don't pile up
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         slack=5)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        for i in range(2000):
+            event_scheduler.enterabs(i % 10 + 1,
+                                     0,
+                                     insert_into_list,
+                                     (i, result_list))
+        TestTimer.advance_time(0)
+        TestTimer.advance_time(20)
+        event_scheduler.stop()
+        self.assertEqual(len(result_list), 2000)
+        self.assertEqual(len(event_scheduler._deadlines), 0)
+
+    def test_tenant_weights(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         tenant_weights={'a': 2})
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        for i in range(4):
+            event_scheduler.enter(1,
+                                  0,
+                                  insert_into_list,
+                                  ('a{}'.format(i), result_list),
+                                  tenant='a')
+        for i in range(2):
+            event_scheduler.enter(1,
+                                  0,
+                                  insert_into_list,
+                                  ('b{}'.format(i), result_list),
+                                  tenant='b')
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        # The events of b don't wait for the backlog of a
+        self.assertListEqual(result_list, ['a0', 'a1', 'b0', 'a2', 'a3', 'b1'])
+        event_scheduler.set_weight('b', 2)
+        with self.assertRaises(ValueError):
+            event_scheduler.set_weight('b', 0)
+        with self.assertRaises(ValueError):
+            EventScheduler().set_weight('b', 1)
+
+    def test_tags(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        first = event_scheduler.enter(2,
+                                      0,
+                                      insert_into_list,
+                                      ('A', result_list),
+                                      tags=['session-1', 'user-1'])
+        event_scheduler.enter(1,
+                              0,
+                              insert_into_list,
+                              ('B', result_list),
+                              tags=['session-1'])
+        event_scheduler.enter(1, 0, insert_into_list, ('C', result_list))
+        event_scheduler.enter_recurring(1,
+                                        0,
+                                        insert_into_list,
+                                        ('D', result_list),
+                                        tags=['session-1'])
+        self.assertEqual(first.tags, frozenset(['session-1', 'user-1']))
+        self.assertListEqual(event_scheduler.events_for_tag('user-1'),
+                             [first])
+        self.assertListEqual([event.argument[0] for event in
+                              event_scheduler.events_for_tag('session-1')],
+                             ['B', 'D', 'A'])
+        self.assertEqual(event_scheduler.cancel_tag('session-1'), 3)
+        self.assertListEqual(event_scheduler.events_for_tag('user-1'), [])
+        self.assertEqual(event_scheduler.cancel_tag('session-1'), 0)
+        self.assertEqual(len(event_scheduler), 1)
+        TestTimer.advance_time(3)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['C'])
+        self.assertEqual(event_scheduler.cancel_tag('session-1'), -1)
+        # A string isn't split into one tag per character
+        with self.assertRaises(ValueError):
+            event_scheduler.enter(1, 0, print, tags='session-1')
+        with self.assertRaises(ValueError):
+            event_scheduler.enter_recurring(1, 0, print, tags=b'session-1')
+
+    def test_periodic_jobs(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        self.assertIsNone(event_scheduler.enter_periodic(1, 0, print))
+        event_scheduler.start()
+        result_list = []
+        slow = event_scheduler.enter_periodic(3,
+                                              0,
+                                              insert_into_list,
+                                              ('A', result_list))
+        event_scheduler.enter_periodic(2,
+                                       0,
+                                       insert_into_list,
+                                       ('B', result_list))
+        # The internal event executing the jobs isn't listed
+        self.assertEqual(len(event_scheduler), 0)
+        self.assertListEqual(event_scheduler.queue, [])
+        self.assertIsNone(event_scheduler.peek())
+        event = event_scheduler.enter(5,
+                                      0,
+                                      insert_into_list,
+                                      ('C', result_list))
+        self.assertIs(event_scheduler.peek(), event)
+        self.assertListEqual(list(event_scheduler.iter_queue()), [event])
+        self.assertEqual(event_scheduler.cancel(event), 0)
+        TestTimer.advance_time(0)
+        TestTimer.advance_time(2)
+        self.assertListEqual(result_list, ['B'])
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['B', 'A'])
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['B', 'A', 'B'])
+        self.assertEqual(event_scheduler.cancel_periodic(slow), 0)
+        TestTimer.advance_time(2)
+        self.assertListEqual(result_list, ['B', 'A', 'B', 'B'])
+        with self.assertRaises(ValueError):
+            event_scheduler.enter_periodic(0, 0, print)
+        event_scheduler.cancel_all()
+        event_scheduler.stop()
+        self.assertEqual(event_scheduler.cancel_periodic(slow), -1)
+
+    def test_periodic_jobs_max_lateness(self):
+        # The internal event of the periodic jobs isn't shed
+        shed = []
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         max_lateness=0.5,
+                                         shed_callback=shed.append)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter_periodic(1,
+                                       0,
+                                       insert_into_list,
+                                       ('A', result_list))
+        TestTimer.advance_time(0)
+        # Late by more than max_lateness
+        TestTimer.advance_time(2)
+        TestTimer.advance_time(1)
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'A', 'A'])
+        self.assertListEqual(shed, [])
+
+    def test_periodic_jobs_stop(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer)
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter_periodic(1,
+                                       0,
+                                       insert_into_list,
+                                       ('A', result_list))
+        event_scheduler.enter(2, 0, insert_into_list, ('B', result_list))
+        TestTimer.advance_time(0)
+        TestTimer.advance_time(2)
+        # The soft stop doesn't wait for the next occurrence of the jobs
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'A', 'B'])
+        self.assertEqual(len(event_scheduler._periodic), 0)
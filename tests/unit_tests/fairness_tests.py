@@ -0,0 +1,40 @@
+from event_scheduler.event_scheduler import Event
+from event_scheduler.fairness import DeficitRoundRobin
+import unittest
+
+
+def entry(sequence, tenant):
+    return (0, 0, sequence, Event(0, 0, None, (), {}, 0, tenant=tenant))
+
+
+class DeficitRoundRobinTests(unittest.TestCase):
+
+    def test_weights(self):
+        fair = DeficitRoundRobin({'A': 3, 'C': 0.5})
+        for sequence in range(6):
+            fair.push(entry(sequence, 'A'))
+        for sequence in range(6, 9):
+            fair.push(entry(sequence, 'B'))
+        for sequence in range(9, 11):
+            fair.push(entry(sequence, 'C'))
+        self.assertEqual(len(fair), 11)
+        order = [fair.pop()[3].tenant for _ in range(11)]
+        self.assertListEqual(order, ['A', 'A', 'A', 'B', 'A', 'A', 'A', 'B',
+                                     'C', 'B', 'C'])
+        self.assertEqual(len(fair), 0)
+
+    def test_fifo_per_tenant(self):
+        fair = DeficitRoundRobin()
+        for sequence in range(4):
+            fair.push(entry(sequence, sequence % 2))
+        self.assertListEqual([fair.pop()[2] for _ in range(4)], [0, 1, 2, 3])
+        fair.push(entry(4, None))
+        fair.clear()
+        self.assertEqual(len(fair), 0)
+        self.assertListEqual(list(fair), [])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            DeficitRoundRobin({'A': 0})
+        with self.assertRaises(ValueError):
+            DeficitRoundRobin().set_weight('A', -1)
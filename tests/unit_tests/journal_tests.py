@@ -0,0 +1,150 @@
+import os
+import tempfile
+
+from event_scheduler.event_scheduler import EventScheduler
+from event_scheduler.journal import Journal
+from event_scheduler.test_util import TestTimer
+import unittest
+
+
+def insert_into_list(item, list_obj: list):
+    list_obj.append(item)
+
+
+RESULTS = []
+
+
+def record_result(item):
+    RESULTS.append(item)
+
+
+ACTIONS = {'record_result': record_result}
+TEST_THREAD = "test_thread"
+
+
+class JournalTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'events.log')
+        RESULTS.clear()
+
+    def tearDown(self) -> None:
+        TestTimer.reset()
+        self.directory.cleanup()
+
+    def start_scheduler(self, **kwargs):
+        TestTimer.reset()
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         journal=Journal(self.path,
+                                                         ACTIONS,
+                                                         **kwargs))
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        return event_scheduler
+
+    def test_restore_events(self):
+        event_scheduler = self.start_scheduler()
+        event_scheduler.enter(1, 0, record_result, ('A',))
+        event_scheduler.enter(50, 0, record_result, ('B',))
+        event_scheduler.enter_many([(60, 1, record_result, (), {'item': 'C'}),
+                                    (70, 0, record_result, ('D',))])
+        cancelled = event_scheduler.enter(80, 0, record_result, ('X',))
+        event_scheduler.cancel(cancelled)
+        event_scheduler.enter_recurring(100, 0, record_result, ('R',))
+        # Not in the registry so not persisted
+        event_scheduler.enter(2, 0, insert_into_list, ('Y', []))
+        TestTimer.advance_time(1)
+        self.assertListEqual(RESULTS, ['A'])
+        event_scheduler.stop(True)
+
+        event_scheduler = self.start_scheduler()
+        self.assertListEqual([event.argument or event.kwargs['item']
+                              for event in event_scheduler.queue],
+                             [('B',), 'C', ('D',), ('R',)])
+        self.assertAlmostEqual(event_scheduler.queue[0].time, 49, delta=1)
+        TestTimer.advance_time(100)
+        event_scheduler.stop(True)
+        self.assertListEqual(RESULTS, ['A', 'B', 'C', 'D', 'R'])
+
+        # Only the recurring event is still pending
+        event_scheduler = self.start_scheduler()
+        self.assertListEqual([event.argument
+                              for event in event_scheduler.queue],
+                             [('R',)])
+        event_scheduler.cancel_all()
+        event_scheduler.stop()
+        event_scheduler = self.start_scheduler()
+        self.assertListEqual(event_scheduler.queue, [])
+        event_scheduler.stop()
+
+    def test_restore_event_options(self):
+        event_scheduler = self.start_scheduler()
+        event_scheduler.enter(50,
+                              0,
+                              record_result,
+                              ('A',),
+                              key='user-42',
+                              max_lateness=5,
+                              tags=('session-1',))
+        event_scheduler.stop(True)
+        event_scheduler = self.start_scheduler()
+        event = event_scheduler.queue[0]
+        self.assertEqual(event.key, 'user-42')
+        self.assertEqual(event.max_lateness, 5)
+        self.assertEqual(event.tags, frozenset(['session-1']))
+        self.assertListEqual(event_scheduler.events_for_tag('session-1'),
+                             [event])
+        event_scheduler.stop(True)
+
+    def test_snapshot(self):
+        event_scheduler = self.start_scheduler(snapshot_every=3)
+        events = [event_scheduler.enter(10 + i, 0, record_result, (i,))
+                  for i in range(5)]
+        event_scheduler.cancel(events[0])
+        event_scheduler.stop(True)
+        self.assertTrue(os.path.exists(self.path + '.snapshot'))
+
+        event_scheduler = self.start_scheduler(snapshot_every=3)
+        self.assertListEqual([event.argument[0]
+                              for event in event_scheduler.queue],
+                             [1, 2, 3, 4])
+        event_scheduler.stop(True)
+
+    def test_partially_written_record(self):
+        event_scheduler = self.start_scheduler()
+        event_scheduler.enter(10, 0, record_result, ('A',))
+        event_scheduler.stop(True)
+        with open(self.path, 'a') as log:
+            log.write('{"seq": 2, "op": "ent')
+        event_scheduler = self.start_scheduler()
+        self.assertEqual(len(event_scheduler.queue), 1)
+        event_scheduler.enter(20, 0, record_result, ('B',))
+        event_scheduler.stop(True)
+        event_scheduler = self.start_scheduler()
+        self.assertEqual(len(event_scheduler.queue), 2)
+        event_scheduler.stop(True)
+
+    def test_arguments_not_serializable(self):
+        event_scheduler = self.start_scheduler()
+        with self.assertRaises(ValueError):
+            event_scheduler.enter(10, 0, record_result, (object(),))
+        self.assertListEqual(event_scheduler.queue, [])
+        event_scheduler.stop()
+
+    def test_action_not_in_registry(self):
+        event_scheduler = self.start_scheduler()
+        event_scheduler.enter(10, 0, record_result, ('A',))
+        event_scheduler.stop(True)
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         journal=Journal(self.path, {}))
+        with self.assertRaises(ValueError):
+            event_scheduler.start()
+        # The scheduler isn't started
+        self.assertIsNone(event_scheduler.enter(0, 0, record_result, ('B',)))
+        self.assertFalse(event_scheduler._event_thread.is_alive())
+        self.assertEqual(event_scheduler.stop(), -1)
@@ -0,0 +1,38 @@
+from event_scheduler.limits import KeyLimit
+import unittest
+
+
+class KeyLimitTests(unittest.TestCase):
+
+    def test_token_bucket(self):
+        limit = KeyLimit(rate=2, burst=2)
+        for _ in range(2):
+            self.assertEqual(limit.delay(0), 0)
+            limit.acquire()
+        self.assertAlmostEqual(limit.delay(0), 0.5)
+        self.assertAlmostEqual(limit.delay(0.25), 0.25)
+        self.assertEqual(limit.delay(0.5), 0)
+        # The bucket doesn't hold more than burst tokens
+        limit.acquire()
+        self.assertEqual(limit.delay(10), 0)
+        limit.acquire()
+        limit.acquire()
+        self.assertGreater(limit.delay(10), 0)
+
+    def test_max_concurrent(self):
+        limit = KeyLimit(max_concurrent=2)
+        self.assertFalse(limit.saturated())
+        limit.acquire()
+        limit.acquire()
+        self.assertTrue(limit.saturated())
+        limit.running -= 1
+        self.assertFalse(limit.saturated())
+        self.assertEqual(limit.delay(0), 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            KeyLimit(max_concurrent=0)
+        with self.assertRaises(ValueError):
+            KeyLimit(rate=0)
+        with self.assertRaises(ValueError):
+            KeyLimit(rate=1, burst=0)
@@ -0,0 +1,36 @@
+from event_scheduler.metrics import Histogram
+import unittest
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_empty(self):
+        histogram = Histogram()
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 0)
+        self.assertIsNone(snapshot['mean'])
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 1001):
+            histogram.record(value / 1000)
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.min, 0.001)
+        self.assertEqual(histogram.max, 1)
+        self.assertAlmostEqual(histogram.total / histogram.count, 0.5005)
+        # Percentiles are accurate to within 1/16th of the value
+        for percent in (50, 90, 99):
+            self.assertAlmostEqual(histogram.percentile(percent),
+                                   percent / 100,
+                                   delta=percent / 100 / 16)
+        self.assertEqual(histogram.percentile(100), 1)
+
+    def test_zeros(self):
+        histogram = Histogram()
+        histogram.record(0)
+        histogram.record(-1)
+        histogram.record(2)
+        self.assertEqual(histogram.min, 0)
+        self.assertEqual(histogram.percentile(50), 0)
+        self.assertEqual(histogram.percentile(99), 2)
@@ -0,0 +1,55 @@
+from event_scheduler.periodic import PeriodicJobTable
+import unittest
+
+
+class PeriodicJobTableTests(unittest.TestCase):
+
+    def test_pop_due(self):
+        table = PeriodicJobTable()
+        slow = table.add(3, 3, 0, print, ('slow',))
+        fast = table.add(2, 2, 0, print, ('fast',))
+        urgent = table.add(2, 2, -1, len, ((),))
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.peek(), urgent)
+        self.assertEqual(table.pop_due(1), -1)
+        # Due jobs by time and priority, rescheduled in place
+        fired = [table.pop_due(6) for _ in range(7)]
+        self.assertListEqual(fired, [urgent, fast, slow, urgent, fast,
+                                     urgent, slow])
+        self.assertEqual(table.pop_due(6), fast)
+        self.assertEqual(table.pop_due(6), -1)
+        self.assertEqual(table.times[fast], 8)
+        self.assertIs(table.actions[table.action_indexes[fast]], print)
+        self.assertEqual(table.action_indexes[fast],
+                         table.action_indexes[slow])
+        self.assertEqual(table.arguments[slow], ('slow',))
+
+    def test_remove(self):
+        table = PeriodicJobTable()
+        jobs = [table.add(time, 10, 0, print) for time in range(10, 0, -1)]
+        self.assertTrue(table.remove(jobs[-1]))
+        self.assertFalse(table.remove(jobs[-1]))
+        self.assertFalse(table.remove(100))
+        self.assertTrue(table.remove(jobs[4]))
+        self.assertEqual(len(table), 8)
+        # The slot of a removed job is reused, with a new id
+        job_id = table.add(0, 10, 0, print)
+        self.assertNotIn(job_id, jobs)
+        self.assertEqual(table.peek(), jobs[4])
+        self.assertEqual(table.job_id(table.peek()), job_id)
+        self.assertFalse(table.remove(jobs[4]))
+        self.assertEqual(len(table), 9)
+        times = []
+        while table.peek() >= 0:
+            job = table.peek()
+            times.append(table.times[job])
+            self.assertTrue(table.remove(table.job_id(job)))
+        self.assertListEqual(times, [0, 2, 3, 4, 5, 7, 8, 9, 10])
+        job_id = table.add(1, 1, 0, print)
+        table.clear()
+        self.assertEqual(len(table), 0)
+        self.assertEqual(table.pop_due(10), -1)
+        # The ids of the jobs removed by clear() are stale
+        self.assertNotEqual(table.add(1, 1, 0, print), job_id)
+        self.assertFalse(table.remove(job_id))
+        self.assertEqual(len(table), 1)
@@ -0,0 +1,102 @@
+from functools import partial
+import itertools
+import random
+
+from event_scheduler.event_scheduler import Event, EventScheduler
+from event_scheduler.queues import HeapQueue, TimingWheelQueue
+from event_scheduler.test_util import TestTimer
+import unittest
+
+
+def insert_into_list(item, list_obj: list):
+    list_obj.append(item)
+
+
+SEQUENCE = itertools.count()
+
+
+def make_entry(time, priority=0):
+    event = Event(time, priority, None, (), {}, 0)
+    return time, priority, next(SEQUENCE), event
+
+
+def drain(queue):
+    return [queue.pop() for _ in range(len(queue))]
+
+
+TEST_THREAD = "test_thread"
+
+
+class TimingWheelQueueTests(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        TestTimer.reset()
+
+    def test_same_order_as_heap(self):
+        rng = random.Random(7)
+        heap_queue = HeapQueue()
+        wheel_queue = TimingWheelQueue(resolution=0.01, slot_bits=2, levels=3)
+        # Spread the events over all the levels and the overflow
+        for _ in range(2000):
+            entry = make_entry(round(rng.uniform(-1, 5), 3), rng.randrange(3))
+            heap_queue.push(entry)
+            wheel_queue.push(entry)
+        self.assertEqual(len(wheel_queue), 2000)
+        self.assertListEqual(drain(wheel_queue), drain(heap_queue))
+        self.assertIsNone(wheel_queue.peek())
+
+    def test_interleaved_push_and_pop(self):
+        rng = random.Random(11)
+        heap_queue = HeapQueue()
+        wheel_queue = TimingWheelQueue(resolution=1, slot_bits=3, levels=2)
+        now = 0
+        for _ in range(500):
+            for _ in range(rng.randrange(4)):
+                entry = make_entry(now + rng.randrange(200), rng.randrange(3))
+                heap_queue.push(entry)
+                wheel_queue.push(entry)
+            if heap_queue.peek():
+                self.assertIs(wheel_queue.peek(), heap_queue.peek())
+                entry = heap_queue.pop()
+                now = entry[0]
+                self.assertIs(wheel_queue.pop(), entry)
+        self.assertListEqual(drain(wheel_queue), drain(heap_queue))
+
+    def test_compact(self):
+        wheel_queue = TimingWheelQueue(resolution=1, slot_bits=2, levels=2)
+        for time in range(40):
+            wheel_queue.push(make_entry(time))
+        wheel_queue.compact(lambda entry: entry[0] % 10 == 0)
+        self.assertEqual(len(wheel_queue), 4)
+        self.assertListEqual([entry[0] for entry in drain(wheel_queue)],
+                             [0, 10, 20, 30])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            TimingWheelQueue(resolution=0)
+        with self.assertRaises(ValueError):
+            TimingWheelQueue(slot_bits=0)
+
+    def test_event_scheduler_timing_wheel(self):
+        event_scheduler = EventScheduler(TEST_THREAD,
+                                         TestTimer.monotonic,
+                                         TestTimer,
+                                         queue_class=partial(TimingWheelQueue,
+                                                             resolution=1))
+        TestTimer.set_event_scheduler(event_scheduler)
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enterabs(4.5, 2, insert_into_list, ('C', result_list))
+        event_scheduler.enterabs(4.2, 1, insert_into_list, ('B', result_list))
+        event = event_scheduler.enterabs(300,
+                                         1,
+                                         insert_into_list,
+                                         ('X', result_list))
+        event_scheduler.enterabs(1, 1, insert_into_list, ('A', result_list))
+        event_scheduler.cancel(event)
+        TestTimer.advance_time(1)
+        self.assertListEqual(result_list, ['A'])
+        TestTimer.advance_time(4)
+        self.assertListEqual(result_list, ['A', 'B', 'C'])
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['A', 'B', 'C'])
@@ -0,0 +1,108 @@
+import threading
+
+from event_scheduler.event_scheduler import CatchUpPolicy
+from event_scheduler.sharded_event_scheduler import ShardedEventScheduler
+import unittest
+
+
+def insert_into_list(item, list_obj: list):
+    list_obj.append(item)
+
+
+TEST_THREAD = "test_thread"
+
+
+class ShardedEventSchedulerTests(unittest.TestCase):
+
+    def test_breathing(self):
+        event_scheduler = ShardedEventScheduler(4, TEST_THREAD)
+        self.assertEqual(event_scheduler.start(), 0)
+        self.assertEqual(event_scheduler.start(), -1)
+        self.assertEqual(event_scheduler.stop(), 0)
+        self.assertEqual(event_scheduler.stop(), -1)
+        with self.assertRaises(ValueError):
+            ShardedEventScheduler(0)
+
+    def test_per_key_ordering(self):
+        event_scheduler = ShardedEventScheduler(4, TEST_THREAD)
+        event_scheduler.start()
+        results = {key: [] for key in range(8)}
+        # The times don't depend on how long entering the events takes
+        base = event_scheduler.shards[0].timefunc() + 0.2
+        for key in results:
+            for item in range(20):
+                # Later items have a sooner time, they must execute first
+                event_scheduler.enterabs(base - item / 1000,
+                                         0,
+                                         insert_into_list,
+                                         (item, results[key]),
+                                         key=key)
+        event_scheduler.stop()
+        for items in results.values():
+            self.assertListEqual(items, list(reversed(range(20))))
+
+    def test_round_robin_and_queue(self):
+        event_scheduler = ShardedEventScheduler(3, TEST_THREAD, metrics=True)
+        event_scheduler.start()
+        events = event_scheduler.enter_many([(30 + i, 0, print)
+                                             for i in range(6)])
+        self.assertEqual(len(events), 6)
+        self.assertListEqual(event_scheduler.queue, sorted(events))
+        stats = event_scheduler.stats()
+        self.assertEqual(stats['queue_depth'], 6)
+        self.assertEqual(stats['entered'], 6)
+        self.assertListEqual([shard['queue_depth']
+                              for shard in stats['shards']], [2, 2, 2])
+        event_scheduler.cancel(events[0])
+        self.assertEqual(len(event_scheduler.queue), 5)
+        event_scheduler.stop(True)
+
+    def test_batch_keys(self):
+        event_scheduler = ShardedEventScheduler(4, TEST_THREAD)
+        event_scheduler.start()
+        # Every event of the batch goes to the shard of its own key
+        events = event_scheduler.enter_many([(30 + i, 0, print, (), {}, 'K')
+                                             for i in range(4)])
+        self.assertListEqual(sorted(len(shard)
+                                    for shard in event_scheduler.shards),
+                             [0, 0, 0, 4])
+        for event in events:
+            self.assertIsNotNone(event_scheduler.reschedule(event,
+                                                            event.time + 30))
+        # Same parameter order as EventScheduler.enter_recurring()
+        event_scheduler.enter_recurring(30,
+                                        0,
+                                        print,
+                                        (),
+                                        {},
+                                        CatchUpPolicy.COALESCE)
+        self.assertCountEqual([event.key for event in event_scheduler.queue],
+                              [None, 'K', 'K', 'K', 'K'])
+        event_scheduler.stop(True)
+
+    def test_cancel_recurring(self):
+        event_scheduler = ShardedEventScheduler(3, TEST_THREAD)
+        event_scheduler.start()
+        fired = threading.Event()
+        event_ids = [event_scheduler.enter_recurring(30, 0, print)
+                     for _ in range(3)]
+        event_ids.append(event_scheduler.enter_recurring(0.01, 0, fired.set))
+        self.assertEqual(len(set(event_ids)), 4)
+        self.assertTrue(fired.wait(5))
+        for event_id in event_ids:
+            event_scheduler.cancel_recurring(event_id)
+        self.assertListEqual(event_scheduler.queue, [])
+        event_scheduler.stop()
+
+    def test_introspection(self):
+        event_scheduler = ShardedEventScheduler(3, TEST_THREAD)
+        event_scheduler.start()
+        events = [event_scheduler.enter(30 + delay, 0, print, (delay,))
+                  for delay in (4, 2, 3, 0, 1)]
+        self.assertEqual(len(event_scheduler), 5)
+        self.assertIs(event_scheduler.peek(), events[3])
+        self.assertListEqual(list(event_scheduler.iter_queue()),
+                             sorted(events))
+        self.assertListEqual(event_scheduler.events_for_action(print),
+                             sorted(events))
+        event_scheduler.stop(True)
@@ -0,0 +1,151 @@
+import os
+import tempfile
+
+from event_scheduler.event_scheduler import CatchUpPolicy
+from event_scheduler.journal import Journal
+from event_scheduler.simulation import SimulatedEventScheduler
+import unittest
+
+
+def insert_into_list(item, list_obj: list):
+    list_obj.append(item)
+
+
+class SimulatedEventSchedulerTests(unittest.TestCase):
+
+    def test_breathing(self):
+        event_scheduler = SimulatedEventScheduler()
+        self.assertEqual(event_scheduler.start(), 0)
+        self.assertEqual(event_scheduler.start(), -1)
+        self.assertEqual(event_scheduler.stop(), 0)
+        self.assertEqual(event_scheduler.stop(), -1)
+        with self.assertRaises(ValueError):
+            SimulatedEventScheduler(max_workers=2)
+
+    def test_run_until(self):
+        event_scheduler = SimulatedEventScheduler(start_time=100)
+        event_scheduler.start()
+        result_list = []
+
+        def chain(item):
+            result_list.append((event_scheduler.timefunc(), item))
+            if item < 3:
+                event_scheduler.enter(10, 0, chain, (item + 1,))
+
+        event_scheduler.enter(5, 0, chain, (0,))
+        event_scheduler.enter(5, 1, insert_into_list, ('A', result_list))
+        self.assertEqual(event_scheduler.run_until(120), 3)
+        self.assertListEqual(result_list,
+                             [(105, 0), 'A', (115, 1)])
+        self.assertEqual(event_scheduler.timefunc(), 120)
+        with self.assertRaises(ValueError):
+            event_scheduler.run_until(110)
+        self.assertEqual(event_scheduler.run_all(), 2)
+        self.assertListEqual(result_list[3:], [(125, 2), (135, 3)])
+        self.assertEqual(event_scheduler.timefunc(), 135)
+        event_scheduler.stop()
+
+    def test_recurring_events(self):
+        event_scheduler = SimulatedEventScheduler()
+        event_scheduler.start()
+        ticks = []
+        event_scheduler.enter_recurring(60, 0, insert_into_list, ('M', ticks))
+        event_scheduler.enter_recurring(3600,
+                                        0,
+                                        insert_into_list,
+                                        ('H', ticks),
+                                        catch_up=CatchUpPolicy.FIXED_DELAY)
+        # A simulated day
+        event_scheduler.run_until(86400)
+        self.assertEqual(ticks.count('M'), 1440)
+        self.assertEqual(ticks.count('H'), 24)
+        # Recurring events aren't rescheduled when stopping
+        event_scheduler.stop()
+        self.assertEqual(len(event_scheduler), 0)
+
+    def test_deterministic(self):
+        def simulate():
+            event_scheduler = SimulatedEventScheduler()
+            event_scheduler.start()
+            result_list = []
+            for index in range(100):
+                event_scheduler.enter(index % 7,
+                                      index % 3,
+                                      insert_into_list,
+                                      (index, result_list))
+            event_scheduler.stop()
+            return result_list
+
+        result_list = simulate()
+        self.assertEqual(len(result_list), 100)
+        self.assertListEqual(simulate(), result_list)
+
+    def test_slack(self):
+        event_scheduler = SimulatedEventScheduler()
+        event_scheduler.start()
+        result_list = []
+
+        def record(item):
+            result_list.append((event_scheduler.timefunc(), item))
+
+        event_scheduler.enterabs(1, 0, record, ('A',), slack=5)
+        event_scheduler.enterabs(3, 0, record, ('B',), slack=5)
+        event_scheduler.enterabs(4, 0, record, ('C',))
+        event_scheduler.enterabs(10, 0, record, ('D',), slack=2)
+        # The events whose windows overlap execute in a single wakeup
+        self.assertEqual(event_scheduler.run_until(9), 3)
+        self.assertListEqual(result_list, [(4, 'A'), (4, 'B'), (4, 'C')])
+        self.assertEqual(event_scheduler.run_all(), 1)
+        self.assertListEqual(result_list[3:], [(12, 'D')])
+        event_scheduler.stop()
+
+    def test_tenant_weights(self):
+        event_scheduler = SimulatedEventScheduler(tenant_weights={})
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter_many((1, 0, insert_into_list,
+                                    (tenant, result_list), {}, None, None,
+                                    None, tenant)
+                                   for tenant in 'aaab')
+        self.assertEqual(event_scheduler.run_until(1), 4)
+        self.assertListEqual(result_list, ['a', 'b', 'a', 'a'])
+        event_scheduler.stop()
+
+    def test_periodic_jobs_stop(self):
+        event_scheduler = SimulatedEventScheduler()
+        event_scheduler.start()
+        result_list = []
+        event_scheduler.enter_periodic(10,
+                                       0,
+                                       insert_into_list,
+                                       ('p', result_list))
+        event_scheduler.enter(5, 0, insert_into_list, ('e', result_list))
+        event_scheduler.run_until(25)
+        # The soft stop doesn't run the next occurrence of the jobs
+        event_scheduler.stop()
+        self.assertListEqual(result_list, ['e', 'p', 'p'])
+        self.assertEqual(event_scheduler.timefunc(), 25)
+        self.assertEqual(len(event_scheduler._periodic), 0)
+
+    def test_journal(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'events.log')
+        actions = {'insert_into_list': insert_into_list}
+        event_scheduler = SimulatedEventScheduler(
+            journal=Journal(path, actions))
+        event_scheduler.start()
+        event_scheduler.enter(10, 0, insert_into_list, ('A', []))
+        event_scheduler.stop(True)
+        event_scheduler = SimulatedEventScheduler(
+            journal=Journal(path, actions))
+        event_scheduler.start()
+        self.assertListEqual([event.argument[0]
+                              for event in event_scheduler.queue], ['A'])
+        event_scheduler.stop(True)
+        # Not started if an action of the journal isn't in the registry
+        event_scheduler = SimulatedEventScheduler(journal=Journal(path, {}))
+        with self.assertRaises(ValueError):
+            event_scheduler.start()
+        self.assertIsNone(event_scheduler.enter(0, 0, print))
+        self.assertEqual(event_scheduler.stop(), -1)
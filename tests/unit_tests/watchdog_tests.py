@@ -0,0 +1,48 @@
+import threading
+from time import monotonic
+
+from event_scheduler.event_scheduler import EventScheduler
+from event_scheduler.watchdog import Watchdog
+import unittest
+
+
+class WatchdogTests(unittest.TestCase):
+
+    def test_report_slow_action(self):
+        reports = []
+        watchdog = Watchdog(0.02, lambda *report: reports.append(report))
+        release = threading.Event()
+        event_scheduler = EventScheduler('test_thread', watchdog=watchdog)
+        event_scheduler.start()
+        event = event_scheduler.enter(0, 0, release.wait, (5,))
+        event_scheduler.enter(0, 1, len, ((),))
+        deadline = monotonic() + 5
+        while not reports and monotonic() < deadline:
+            threading.Event().wait(0.01)
+        release.set()
+        event_scheduler.stop()
+        if not reports:
+            self.fail('The slow action was not reported')
+        # Only the slow action is reported, once
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(watchdog.reported, 1)
+        subject, elapsed, stack = reports[0]
+        self.assertIs(subject, event)
+        self.assertGreater(elapsed, 0.02)
+        self.assertIn('wait', stack)
+
+    def test_check(self):
+        reports = []
+        watchdog = Watchdog(0.01,
+                            lambda *report: reports.append(report),
+                            dump_stack=False)
+        token = watchdog.started('action')
+        threading.Event().wait(0.02)
+        watchdog.check()
+        watchdog.check()
+        watchdog.finished(token)
+        self.assertEqual(len(reports), 1)
+        self.assertEqual(reports[0][0], 'action')
+        self.assertIsNone(reports[0][2])
+        with self.assertRaises(ValueError):
+            Watchdog(0)